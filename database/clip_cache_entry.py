@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from database.timestamps import from_epoch
+
+class ClipCacheEntry:
+    """
+    Represents a single entry from the 'clip_cache' database table.
+    Provides getter methods for each column.
+    """
+    def __init__(self, cache_key: str, file_name: str, checksum: str, size: int,
+                 created_timestamp: int, last_used_timestamp: int):
+        self._cache_key = cache_key
+        self._file_name = file_name
+        self._checksum = checksum
+        self._size = size
+        self._created_timestamp = created_timestamp
+        self._last_used_timestamp = last_used_timestamp
+
+    def get_cache_key(self) -> str:
+        """Returns the hash of the render parameters."""
+        return self._cache_key
+
+    def get_file_name(self) -> str:
+        """Returns the file name of the clip in the clip folder."""
+        return self._file_name
+
+    def get_checksum(self) -> str:
+        """Returns the SHA-256 of the clip file."""
+        return self._checksum
+
+    def get_size(self) -> int:
+        """Returns the size of the clip file in bytes."""
+        return self._size
+
+    def get_created_timestamp(self) -> datetime:
+        """Returns the time when the clip was cached, as a timezone-aware UTC datetime."""
+        return from_epoch(self._created_timestamp)
+
+    def get_last_used_timestamp(self) -> datetime:
+        """Returns the time when the clip was last stored or served, as a timezone-aware UTC datetime."""
+        return from_epoch(self._last_used_timestamp)
+
+    def __repr__(self):
+        """Provides a string representation for debugging."""
+        return f"ClipCacheEntry(file_name='{self._file_name}', size={self._size})"
@@ -1,19 +1,87 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Iterable, Iterator
 
+from database.clip_cache_entry import ClipCacheEntry
 from database.file_log_entry import FileLogEntry, ReviewStatus
+from database.generation_job import GenerationJob, GenerationJobStatus
+from database.migrations import Migrations
+from database.timestamps import from_epoch, now_epoch, to_epoch
+from database.youtube_upload import YoutubeUpload
 from enum import StrEnum
+from metrics.metrics import Metrics
 
 # --- Configuration ---
 DATABASE_NAME = 'file_records.db'
+BUSY_TIMEOUT = 30 # seconds a writer waits for another writer before giving up
+PAGE_SIZE = 200 # Rows fetched per query by the streaming getters
+
+# Applied to every new connection. WAL lets readers and one writer work at the same time,
+# synchronous=NORMAL is durable in WAL mode while skipping an fsync per commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}",
+    "PRAGMA cache_size = -16000", # 16 MB page cache
+    "PRAGMA temp_store = MEMORY",
+)
 
 # --- Database Schema ---
+# Created and upgraded by the migrations in database.migrations.
 # file_logs table:
 # - id: INTEGER PRIMARY KEY AUTOINCREMENT (unique identifier for each log entry)
 # - description: TEXT NOT NULL (the description of the file)
 # - filename: TEXT NOT NULL (the name of the file)
-# - creation_timestamp: TEXT NOT NULL (ISO 8601 formatted timestamp when the record was created)
-# - uploaded_youtube: TEXT DEFAULT NULL (ISO 8601 formatted timestamp when uploaded to YouTube, or NULL if not yet)
+# - creation_timestamp: INTEGER NOT NULL (UTC epoch seconds when the record was created)
+# - uploaded_youtube: INTEGER DEFAULT NULL (UTC epoch seconds of the scheduled YouTube publish time, or NULL if not yet uploaded)
+#
+# generation_jobs table (journal of submitted renders, so a restart can pick them up again):
+# - id: INTEGER PRIMARY KEY AUTOINCREMENT
+# - prompt: TEXT NOT NULL (the prompt that was rendered)
+# - fetch_url: TEXT DEFAULT NULL (the URL to poll for the result)
+# - status: TEXT NOT NULL (GenerationJobStatus)
+# - eta: REAL DEFAULT NULL (last ETA in seconds reported by the provider)
+# - attempts: INTEGER NOT NULL (how many times the job was started or resumed)
+# - output_url: TEXT DEFAULT NULL (the URL of the finished clip)
+# - file_name: TEXT NOT NULL (the file name the clip is downloaded to)
+# - created_timestamp: INTEGER NOT NULL (UTC epoch seconds when the job was submitted)
+# - updated_timestamp: INTEGER NOT NULL (UTC epoch seconds of the last change)
+#
+# youtube_uploads table (resumable upload sessions, so a restart continues instead of re-uploading):
+# - log_id: INTEGER PRIMARY KEY (the file_logs entry being uploaded)
+# - session_uri: TEXT DEFAULT NULL (the resumable session URI returned by the API)
+# - progress: INTEGER NOT NULL (bytes the server has acknowledged)
+# - video_id: TEXT DEFAULT NULL (the ID of the created video, set once the upload completed)
+# - publish_at: INTEGER DEFAULT NULL (UTC epoch seconds of the publish time sent with the session)
+# - updated_timestamp: INTEGER NOT NULL (UTC epoch seconds of the last change)
+# - attempts: INTEGER NOT NULL (failed upload attempts so far)
+# - last_error: TEXT DEFAULT NULL (the error of the last failed attempt)
+# - next_attempt_at: INTEGER DEFAULT NULL (UTC epoch seconds before which the upload isn't retried)
+# - dead_letter: INTEGER NOT NULL (1 once the upload failed too often and is no longer retried)
+#
+# clip_cache table (downloaded clips by the hash of the prompt and render parameters that produced them):
+# - cache_key: TEXT PRIMARY KEY (SHA-256 of the canonical render parameters)
+# - file_name: TEXT NOT NULL (the clip in the clip folder)
+# - checksum: TEXT NOT NULL (SHA-256 of the clip file)
+# - size: INTEGER NOT NULL (size of the clip file in bytes)
+# - created_timestamp: INTEGER NOT NULL (UTC epoch seconds when the clip was cached)
+# - last_used_timestamp: INTEGER NOT NULL (UTC epoch seconds when the clip was last stored or served)
+#
+# metrics table (timing spans of pipeline stages, see metrics.metrics):
+# - id: INTEGER PRIMARY KEY AUTOINCREMENT
+# - stage: TEXT NOT NULL (e.g. 'render', 'download', 'upload', 'db_transaction')
+# - subject: TEXT (what the span was about, e.g. a file name or log ID)
+# - started_timestamp: INTEGER NOT NULL (UTC epoch seconds when the span started)
+# - duration: REAL NOT NULL (seconds)
+# - bytes: INTEGER (bytes moved during the span, NULL if not applicable)
+# - ok: INTEGER NOT NULL (1 if the stage succeeded, 0 if it failed)
+#
+# api_quota table (units of a daily API quota spent in the current quota window):
+# - api: TEXT PRIMARY KEY (name of the quota, e.g. 'youtube')
+# - window_start: INTEGER NOT NULL (UTC epoch seconds when the current window started)
+# - used: INTEGER NOT NULL (units spent since window_start)
 
 class FileLogColumns(StrEnum):
     """Enum for column names in the 'file_logs' table."""
@@ -24,41 +92,166 @@ class FileLogColumns(StrEnum):
     UPLOADED_YOUTUBE = "uploaded_youtube"
     REVIEWED = "reviewed"
 
+class GenerationJobColumns(StrEnum):
+    """Enum for column names in the 'generation_jobs' table."""
+    ID = "id"
+    PROMPT = "prompt"
+    FETCH_URL = "fetch_url"
+    STATUS = "status"
+    ETA = "eta"
+    ATTEMPTS = "attempts"
+    OUTPUT_URL = "output_url"
+    FILE_NAME = "file_name"
+    CREATED_TIMESTAMP = "created_timestamp"
+    UPDATED_TIMESTAMP = "updated_timestamp"
+
+class YoutubeUploadColumns(StrEnum):
+    """Enum for column names in the 'youtube_uploads' table."""
+    LOG_ID = "log_id"
+    SESSION_URI = "session_uri"
+    PROGRESS = "progress"
+    VIDEO_ID = "video_id"
+    PUBLISH_AT = "publish_at"
+    UPDATED_TIMESTAMP = "updated_timestamp"
+    ATTEMPTS = "attempts"
+    LAST_ERROR = "last_error"
+    NEXT_ATTEMPT_AT = "next_attempt_at"
+    DEAD_LETTER = "dead_letter"
+
+class ApiQuotaColumns(StrEnum):
+    """Enum for column names in the 'api_quota' table."""
+    API = "api"
+    WINDOW_START = "window_start"
+    USED = "used"
+
+class ClipCacheColumns(StrEnum):
+    """Enum for column names in the 'clip_cache' table."""
+    CACHE_KEY = "cache_key"
+    FILE_NAME = "file_name"
+    CHECKSUM = "checksum"
+    SIZE = "size"
+    CREATED_TIMESTAMP = "created_timestamp"
+    LAST_USED_TIMESTAMP = "last_used_timestamp"
+
+class MetricColumns(StrEnum):
+    """Enum for column names in the 'metrics' table."""
+    ID = "id"
+    STAGE = "stage"
+    SUBJECT = "subject"
+    STARTED_TIMESTAMP = "started_timestamp"
+    DURATION = "duration"
+    BYTES = "bytes"
+    OK = "ok"
+
+FILE_LOG_SELECT_COLUMNS = ", ".join([
+    FileLogColumns.ID,
+    FileLogColumns.DESCRIPTION,
+    FileLogColumns.FILENAME,
+    FileLogColumns.CREATION_TIMESTAMP,
+    FileLogColumns.UPLOADED_YOUTUBE,
+    FileLogColumns.REVIEWED
+])
+
+# Every thread keeps one open connection, sqlite3 connections must not be shared across threads.
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
 class Database:
 
     @staticmethod
     def get_db_connection():
-        """Establishes a connection to the SQLite database."""
+        """
+        Returns the calling thread's connection to the SQLite database, opening it on first use.
+        The connection stays open and is reused by every later call from the same thread.
+        The schema is set up once per process, before the first connection is handed out.
+        """
+        conn = getattr(_local, "conn", None)
+        if conn is not None:
+            return conn
         try:
-            conn = sqlite3.connect(DATABASE_NAME)
+            # isolation_level=None: statements autocommit unless run inside Database.transaction()
+            conn = sqlite3.connect(DATABASE_NAME, timeout=BUSY_TIMEOUT, isolation_level=None)
             conn.row_factory = sqlite3.Row  # This allows accessing columns by name
-            return conn
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
             return None
+        _local.conn = conn
+        _local.transaction_depth = 0
+        Database._ensure_schema()
+        return conn
 
     @staticmethod
-    def create_table_if_not_exists():
-        """Creates the file_logs table if it doesn't already exist, using StringEnum for column names."""
+    def close_db_connection():
+        """Closes the calling thread's connection, e.g. before a worker thread exits."""
+        conn = getattr(_local, "conn", None)
+        if conn is not None:
+            conn.close()
+            _local.conn = None
+
+    @staticmethod
+    @contextmanager
+    def transaction() -> Iterator[sqlite3.Connection]:
+        """
+        Runs the enclosed statements in a single write transaction, committed on success
+        and rolled back on any exception. The write lock is taken up front (BEGIN IMMEDIATE)
+        so concurrent writers queue on busy_timeout instead of failing half-way.
+        Nested uses join the outermost transaction.
+
+        Raises:
+            sqlite3.Error: If no connection could be opened.
+        """
         conn = Database.get_db_connection()
-        if conn:
+        if conn is None:
+            raise sqlite3.OperationalError(f"Could not connect to {DATABASE_NAME}")
+        if _local.transaction_depth > 0:
+            _local.transaction_depth += 1
             try:
-                cursor = conn.cursor()
-                cursor.execute(f'''
-                    CREATE TABLE IF NOT EXISTS file_logs (
-                        {FileLogColumns.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
-                        {FileLogColumns.DESCRIPTION} TEXT NOT NULL,
-                        {FileLogColumns.FILENAME} TEXT NOT NULL,
-                        {FileLogColumns.CREATION_TIMESTAMP} TEXT NOT NULL,
-                        {FileLogColumns.UPLOADED_YOUTUBE} TEXT DEFAULT NULL,
-                        {FileLogColumns.REVIEWED} TEXT DEFAULT '{ReviewStatus.PENDING.value}'
-                    )
-                ''')
+                yield conn
+            finally:
+                _local.transaction_depth -= 1
+            return
+
+        # Timed from before the write lock is taken, so lock contention shows up in the latency
+        with Metrics.span("db_transaction"):
+            conn.execute("BEGIN IMMEDIATE")
+            _local.transaction_depth = 1
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
                 conn.commit()
-            except sqlite3.Error as e:
-                print(f"Error creating table: {e}")
             finally:
-                conn.close()
+                _local.transaction_depth = 0
+
+    @staticmethod
+    def _ensure_schema():
+        global _schema_ready
+        if _schema_ready:
+            return
+        with _schema_lock:
+            if not _schema_ready:
+                _schema_ready = Database.migrate()
+
+    @staticmethod
+    def migrate() -> bool:
+        """
+        Brings the schema up to date by applying pending migrations (see database.migrations).
+        Called once per process by get_db_connection().
+
+        Returns:
+            bool: True if the schema is at the latest version.
+        """
+        try:
+            version = Migrations.apply(Database.get_db_connection())
+            return version == Migrations.get_latest_version()
+        except sqlite3.Error as e:
+            print(f"Error migrating database: {e}")
+            return False
 
     @staticmethod
     def log_file_upload_info(description: str, filename: str):
@@ -72,37 +265,50 @@ class Database:
             description (str): A description of the file/upload.
             filename (str): The name of the file being logged.
         """
-        conn = Database.get_db_connection()
-        if conn is None:
-            return
-        Database.create_table_if_not_exists()
+        Database.log_file_upload_infos([(description, filename)])
 
-        try:
-            cursor = conn.cursor()
-            current_timestamp = datetime.now().isoformat()  # ISO 8601 format
+    @staticmethod
+    def log_file_upload_infos(entries: Iterable[tuple[str, str]]) -> list[int | None]:
+        """
+        Logs several files at once, like log_file_upload_info, in a single transaction (one commit).
 
-            # Use enum members for column names in the INSERT statement, including the new 'reviewed' column
-            cursor.execute(
-                f'''
-                INSERT INTO file_logs (
-                    {FileLogColumns.DESCRIPTION},
-                    {FileLogColumns.FILENAME},
-                    {FileLogColumns.CREATION_TIMESTAMP},
-                    {FileLogColumns.UPLOADED_YOUTUBE},
-                    {FileLogColumns.REVIEWED}
+        Args:
+            entries (Iterable[tuple[str, str]]): (description, filename) pairs.
+        Returns:
+            list[int | None]: The ID of each new log entry, in input order.
+                              All None if the batch could not be written.
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+        current_timestamp = now_epoch()
+        try:
+            with Database.transaction() as conn:
+                # Use enum members for column names in the INSERT statement, including the new 'reviewed' column
+                conn.executemany(
+                    f'''
+                    INSERT INTO file_logs (
+                        {FileLogColumns.DESCRIPTION},
+                        {FileLogColumns.FILENAME},
+                        {FileLogColumns.CREATION_TIMESTAMP},
+                        {FileLogColumns.UPLOADED_YOUTUBE},
+                        {FileLogColumns.REVIEWED}
+                    )
+                    VALUES (?, ?, ?, ?, ?)
+                    ''',
+                    # uploaded_youtube is initially NULL, reviewed is 'Pending'
+                    [(description, filename, current_timestamp, None, ReviewStatus.PENDING.value) for description, filename in entries]
                 )
-                VALUES (?, ?, ?, ?, ?)
-                ''',
-                (description, filename, current_timestamp, None, ReviewStatus.PENDING.value) # uploaded_youtube is initially NULL, reviewed is 'Pending'
-            )
-            conn.commit()
-            print(f"Successfully logged: Description='{description}', Filename='{filename}'")
+                # The write lock is held for the whole batch, so AUTOINCREMENT hands out consecutive IDs
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            for description, filename in entries:
+                print(f"Successfully logged: Description='{description}', Filename='{filename}'")
+            return list(range(last_id - len(entries) + 1, last_id + 1))
         except sqlite3.Error as e:
             print(f"Error logging file info: {e}")
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-        finally:
-            conn.close()
+        return [None] * len(entries)
 
     @staticmethod
     def mark_youtube_uploaded(log_id: int, datetime : datetime):
@@ -112,37 +318,47 @@ class Database:
 
         Args:
             log_id (int): The ID of the log entry to update.
+            datetime (datetime): The scheduled publish time, naive values are taken as local time.
         """
-        conn = Database.get_db_connection()
-        if conn is None:
-            return
+        Database.mark_youtube_uploaded_batch([(log_id, datetime)])
 
-        try:
-            cursor = conn.cursor()
-            timestamp = datetime.isoformat() # Current time when marked as uploaded
+    @staticmethod
+    def mark_youtube_uploaded_batch(uploads: Iterable[tuple[int, datetime]]) -> dict[int, bool]:
+        """
+        Marks several log entries as uploaded to YouTube in a single transaction (one commit).
 
-            # Use enum members for column names in the UPDATE statement
-            cursor.execute(
-                f'''
-                UPDATE file_logs
-                SET {FileLogColumns.UPLOADED_YOUTUBE} = ?
-                WHERE {FileLogColumns.ID} = ?
-                ''',
-                (timestamp, log_id)
-            )
-            conn.commit()
+        Args:
+            uploads (Iterable[tuple[int, datetime]]): (log ID, scheduled publish time) pairs.
+        Returns:
+            dict[int, bool]: For each log ID, whether a matching entry was updated.
+                             All False if the batch could not be written.
+        """
+        rows = [(to_epoch(upload_datetime), log_id) for log_id, upload_datetime in uploads]
+        try:
+            with Database.transaction() as conn:
+                existing_ids = Database._get_existing_log_ids(conn, [log_id for _, log_id in rows])
+                # Use enum members for column names in the UPDATE statement
+                conn.executemany(
+                    f'''
+                    UPDATE file_logs
+                    SET {FileLogColumns.UPLOADED_YOUTUBE} = ?
+                    WHERE {FileLogColumns.ID} = ?
+                    ''',
+                    rows
+                )
 
-            if cursor.rowcount > 0:
-                print(f"Successfully marked log ID {log_id} as uploaded to YouTube at {timestamp}.")
-            else:
-                print(f"No log entry found with ID {log_id}.")
+            for timestamp, log_id in rows:
+                if log_id in existing_ids:
+                    print(f"Successfully marked log ID {log_id} as uploaded to YouTube at {from_epoch(timestamp).isoformat()}.")
+                else:
+                    print(f"No log entry found with ID {log_id}.")
+            return {log_id: log_id in existing_ids for _, log_id in rows}
 
         except sqlite3.Error as e:
-            print(f"Error updating log ID {log_id}: {e}")
+            print(f"Error marking log IDs {[log_id for _, log_id in rows]} as uploaded: {e}")
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-        finally:
-            conn.close()
+        return {log_id: False for _, log_id in rows}
 
     @staticmethod
     def mark_reviewed(log_id: int, reviewed_status: ReviewStatus):
@@ -152,84 +368,170 @@ class Database:
 
         Args:
             log_id (int): The ID of the log entry to update.
-            reviewed_status (bool): The new reviewed status (True or False).
+            reviewed_status (ReviewStatus): The new review status.
         """
-        conn = Database.get_db_connection()
-        if conn is None:
-            return
+        Database.mark_reviewed_batch([(log_id, reviewed_status)])
 
-        try:
-            cursor = conn.cursor()
+    @staticmethod
+    def mark_reviewed_batch(decisions: Iterable[tuple[int, ReviewStatus]]) -> dict[int, bool]:
+        """
+        Applies several review decisions in a single transaction (one commit).
 
-            cursor.execute(
-                f'''
-                UPDATE file_logs
-                SET {FileLogColumns.REVIEWED} = ?
-                WHERE {FileLogColumns.ID} = ?
-                ''',
-                 (reviewed_status.value, log_id)
-            )
-            conn.commit()
+        Args:
+            decisions (Iterable[tuple[int, ReviewStatus]]): (log ID, new review status) pairs.
+        Returns:
+            dict[int, bool]: For each log ID, whether a matching entry was updated.
+                             All False if the batch could not be written.
+        """
+        rows = [(reviewed_status.value, log_id) for log_id, reviewed_status in decisions]
+        try:
+            with Database.transaction() as conn:
+                existing_ids = Database._get_existing_log_ids(conn, [log_id for _, log_id in rows])
+                conn.executemany(
+                    f'''
+                    UPDATE file_logs
+                    SET {FileLogColumns.REVIEWED} = ?
+                    WHERE {FileLogColumns.ID} = ?
+                    ''',
+                    rows
+                )
 
-            if cursor.rowcount > 0:
-                print(f"Successfully set 'reviewed' status for log ID {log_id} to {reviewed_status}.")
-            else:
-                print(f"No log entry found with ID {log_id}.")
+            for reviewed_status, log_id in rows:
+                if log_id in existing_ids:
+                    print(f"Successfully set 'reviewed' status for log ID {log_id} to {reviewed_status}.")
+                else:
+                    print(f"No log entry found with ID {log_id}.")
+            return {log_id: log_id in existing_ids for _, log_id in rows}
 
         except sqlite3.Error as e:
-            print(f"Error updating 'reviewed' status for log ID {log_id}: {e}")
+            print(f"Error updating 'reviewed' status for log IDs {[log_id for _, log_id in rows]}: {e}")
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-        finally:
-            conn.close()
+        return {log_id: False for _, log_id in rows}
+
+    @staticmethod
+    def _get_existing_log_ids(conn: sqlite3.Connection, log_ids: list[int]) -> set[int]:
+        """Returns which of the given IDs exist in file_logs, queried in chunks to stay under SQLite's variable limit."""
+        existing_ids = set()
+        for start in range(0, len(log_ids), 500):
+            chunk = log_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = conn.execute(f"SELECT {FileLogColumns.ID} FROM file_logs WHERE {FileLogColumns.ID} IN ({placeholders})", chunk)
+            existing_ids.update(row[0] for row in cursor)
+        return existing_ids
 
 
     @staticmethod
-    def view_all_logs():
-        """Retrieves and prints all entries from the file_logs table, using StringEnum for column names."""
+    def view_all_logs(limit: int | None = None):
+        """
+        Prints entries from the file_logs table, newest first, using StringEnum for column names.
+        Rows are streamed page by page, so the first ones print immediately however large the table is.
+
+        Args:
+            limit (int | None): Print at most this many entries, or all of them if None.
+        """
+        print_header = True
+        for log_entry in Database.iter_file_logs(limit=limit, descending=True):
+            if print_header:
+                print("\n--- All File Logs ---")
+                print_header = False
+
+            youtube_upload_status = log_entry.get_uploaded_youtube() if log_entry.is_youtube_uploaded() else "N/A (Not yet uploaded)"
+            reviewed_status_display = log_entry.get_review_status().value
+
+            print(f"ID: {log_entry.get_id()}")
+            print(f"  Description: '{log_entry.get_description()}'")
+            print(f"  Filename:    '{log_entry.get_filename()}'")
+            print(f"  Created:     {log_entry.get_creation_timestamp()}")
+            print(f"  YT Uploaded: {youtube_upload_status}")
+            print(f"  Reviewed:    {reviewed_status_display}")
+            print("-" * 30)
+
+        if print_header:
+            print("\nNo log entries found in the database.")
+        else:
+            print("---------------------\n")
+
+    @staticmethod
+    def iter_file_logs(reviewed: ReviewStatus | None = None, uploaded: bool | None = None,
+                       created_after: datetime | None = None, created_before: datetime | None = None,
+                       upload_eligible: bool = False, limit: int | None = None, descending: bool = False,
+                       page_size: int = PAGE_SIZE) -> Iterator[FileLogEntry]:
+        """
+        Streams file_logs entries in creation order, fetching them one page at a time.
+        Pages are located by the (creation_timestamp, id) of the last row seen (keyset
+        pagination), so every page is an index seek, no cursor stays open between pages,
+        and rows updated by the caller while iterating are neither skipped nor repeated.
+
+        Args:
+            reviewed (ReviewStatus | None): Only entries with this review status.
+            uploaded (bool | None): Only entries that are (True) or are not (False) uploaded to YouTube.
+            created_after (datetime | None): Only entries created at or after this time.
+            created_before (datetime | None): Only entries created before this time.
+            upload_eligible (bool): Leave out entries whose upload is dead-lettered or waiting for its next retry.
+            limit (int | None): Stop after this many entries.
+            descending (bool): Newest first instead of oldest first.
+            page_size (int): Rows fetched per query.
+        Yields:
+            FileLogEntry: The matching entries. Iteration stops early if an error occurs.
+        """
         conn = Database.get_db_connection()
         if conn is None:
             return
 
-        try:
-            cursor = conn.cursor()
-            # Use enum members for all column names in the SELECT statement
-            select_columns = ", ".join([
-                FileLogColumns.ID,
-                FileLogColumns.DESCRIPTION,
-                FileLogColumns.FILENAME,
-                FileLogColumns.CREATION_TIMESTAMP,
-                FileLogColumns.UPLOADED_YOUTUBE,
-                FileLogColumns.REVIEWED
-            ])
-            cursor.execute(f"SELECT {select_columns} FROM file_logs ORDER BY {FileLogColumns.CREATION_TIMESTAMP} DESC")
-            rows = cursor.fetchall()
-
-            if not rows:
-                print("\nNo log entries found in the database.")
+        conditions = []
+        params = []
+        if reviewed is not None:
+            conditions.append(f"{FileLogColumns.REVIEWED} = ?")
+            params.append(reviewed.value)
+        if uploaded is not None:
+            conditions.append(f"{FileLogColumns.UPLOADED_YOUTUBE} IS {'NOT ' if uploaded else ''}NULL")
+        if created_after is not None:
+            conditions.append(f"{FileLogColumns.CREATION_TIMESTAMP} >= ?")
+            params.append(to_epoch(created_after))
+        if created_before is not None:
+            conditions.append(f"{FileLogColumns.CREATION_TIMESTAMP} < ?")
+            params.append(to_epoch(created_before))
+        if upload_eligible:
+            conditions.append(f"""{FileLogColumns.ID} NOT IN (
+                SELECT {YoutubeUploadColumns.LOG_ID} FROM youtube_uploads
+                WHERE {YoutubeUploadColumns.DEAD_LETTER} = 1 OR {YoutubeUploadColumns.NEXT_ATTEMPT_AT} > ?
+            )""")
+            params.append(now_epoch())
+
+        order = "DESC" if descending else "ASC"
+        after = "<" if descending else ">"
+        last_key = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_conditions = list(conditions)
+            page_params = list(params)
+            if last_key is not None:
+                page_conditions.append(f"({FileLogColumns.CREATION_TIMESTAMP}, {FileLogColumns.ID}) {after} (?, ?)")
+                page_params.extend(last_key)
+            where = " AND ".join(page_conditions) if page_conditions else "1"
+            fetch_count = page_size if remaining is None else min(page_size, remaining)
+
+            try:
+                rows = conn.execute(f"""
+                        SELECT {FILE_LOG_SELECT_COLUMNS}
+                        FROM file_logs
+                        WHERE {where}
+                        ORDER BY {FileLogColumns.CREATION_TIMESTAMP} {order}, {FileLogColumns.ID} {order}
+                        LIMIT ?
+                    """, page_params + [fetch_count]).fetchall()
+            except sqlite3.Error as e:
+                print(f"Error retrieving logs: {e}")
                 return
 
-            print("\n--- All File Logs ---")
             for row in rows:
-                # Create a FileLogEntry object from the row
-                log_entry = FileLogEntry(**row)
-
-                youtube_upload_status = log_entry.get_uploaded_youtube() if log_entry.is_youtube_uploaded() else "N/A (Not yet uploaded)"
-                reviewed_status_display = log_entry.get_review_status().value
-
-                print(f"ID: {log_entry.get_id()}")
-                print(f"  Description: '{log_entry.get_description()}'")
-                print(f"  Filename:    '{log_entry.get_filename()}'")
-                print(f"  Created:     {log_entry.get_creation_timestamp()}")
-                print(f"  YT Uploaded: {youtube_upload_status}")
-                print(f"  Reviewed:    {reviewed_status_display}")
-                print("-" * 30)
-            print("---------------------\n")
-
-        except sqlite3.Error as e:
-            print(f"Error retrieving logs: {e}")
-        finally:
-            conn.close()
+                # Instantiate FileLogEntry object directly from the sqlite3.Row object
+                yield FileLogEntry(**row)
+            if len(rows) < fetch_count:
+                return
+            last_key = (rows[-1][FileLogColumns.CREATION_TIMESTAMP], rows[-1][FileLogColumns.ID])
+            if remaining is not None:
+                remaining -= len(rows)
 
     @staticmethod
     def count_future_youtube_uploads() -> int:
@@ -238,7 +540,7 @@ class Database:
         This includes:
         1. Entries where 'uploaded_youtube' timestamp is in the future relative to the current time (scheduled uploads).
         2. Entries where 'uploaded_youtube' is NULL and the 'reviewed' status is either PENDING or ACCEPTED
-           (meaning they are awaiting upload and review approval).
+           (meaning they are awaiting upload and review approval), unless their upload was dead-lettered.
 
         Returns:
             int: The count of entries meeting the criteria.
@@ -251,69 +553,38 @@ class Database:
 
         try:
             cursor = conn.cursor()
-            current_timestamp = datetime.now().isoformat()
+            current_timestamp = now_epoch()
+            # Two counts instead of an OR, so each half is answered from its own partial index
             cursor.execute(
                 f"""
-                SELECT COUNT(*) FROM file_logs
-                WHERE
-                    ({FileLogColumns.UPLOADED_YOUTUBE} IS NOT NULL AND {FileLogColumns.UPLOADED_YOUTUBE} > ?)
-                    OR
-                    ({FileLogColumns.UPLOADED_YOUTUBE} IS NULL AND ({FileLogColumns.REVIEWED} = ? OR {FileLogColumns.REVIEWED} = ?))
+                SELECT
+                    (SELECT COUNT(*) FROM file_logs
+                     WHERE {FileLogColumns.UPLOADED_YOUTUBE} IS NOT NULL AND {FileLogColumns.UPLOADED_YOUTUBE} > ?)
+                    +
+                    (SELECT COUNT(*) FROM file_logs
+                     WHERE {FileLogColumns.UPLOADED_YOUTUBE} IS NULL AND {FileLogColumns.REVIEWED} IN (?, ?)
+                       AND {FileLogColumns.ID} NOT IN (
+                           SELECT {YoutubeUploadColumns.LOG_ID} FROM youtube_uploads WHERE {YoutubeUploadColumns.DEAD_LETTER} = 1))
                 """,
                 (current_timestamp, ReviewStatus.PENDING.value, ReviewStatus.ACCEPTED.value)
             )
             count = cursor.fetchone()[0]
         except sqlite3.Error as e:
             print(f"Error counting future YouTube uploads: {e}")
-        finally:
-            conn.close()
         return count
-    
+
     @staticmethod
-    def get_pending_review_entries() -> list[FileLogEntry]:
+    def get_pending_review_entries() -> Iterator[FileLogEntry]:
         """
-        Retrieves all log entries that currently have a 'PENDING' review status,
-        returned as a list of FileLogEntry objects. Uses StringEnum for column names.
+        Streams all log entries that currently have a 'PENDING' review status,
+        oldest first, as FileLogEntry objects. Uses StringEnum for column names.
 
         Returns:
-            list[FileLogEntry]: A list of FileLogEntry objects, where each object
-                                represents a log entry with a 'PENDING' review status.
-                                Returns an empty list if no such entries are found
-                                or an error occurs.
+            Iterator[FileLogEntry]: The entries with a 'PENDING' review status, fetched page by page.
+                                    Yields nothing if no such entries are found or an error occurs.
         """
-        conn = Database.get_db_connection()
-        pending_entries = []
-        if conn is None:
-            return pending_entries
+        return Database.iter_file_logs(reviewed=ReviewStatus.PENDING)
 
-        try:
-            cursor = conn.cursor()
-            select_columns = ", ".join([
-                FileLogColumns.ID,
-                FileLogColumns.DESCRIPTION,
-                FileLogColumns.FILENAME,
-                FileLogColumns.CREATION_TIMESTAMP,
-                FileLogColumns.UPLOADED_YOUTUBE,
-                FileLogColumns.REVIEWED
-            ])
-            cursor.execute(f"""
-                    SELECT {select_columns}
-                    FROM file_logs
-                    WHERE {FileLogColumns.REVIEWED} = ?
-                    ORDER BY {FileLogColumns.CREATION_TIMESTAMP} ASC
-                """, (ReviewStatus.PENDING.value,))
-            rows = cursor.fetchall()
-
-            for row in rows:
-                # Instantiate FileLogEntry object directly from the sqlite3.Row object
-                pending_entries.append(FileLogEntry(**row))
-
-        except sqlite3.Error as e:
-            print(f"Error retrieving pending review entries: {e}")
-        finally:
-            conn.close()
-        return pending_entries
-    
     @staticmethod
     def get_latest_youtube_upload_timestamp() -> datetime | None:
         """
@@ -321,11 +592,11 @@ class Database:
         that has been marked as uploaded to YouTube.
 
         Returns:
-            datetime | None: The datetime object of the latest YouTube upload,
+            datetime | None: The timezone-aware (UTC) datetime of the latest YouTube upload,
                              or None if no entries have been uploaded to YouTube.
         """
         conn = Database.get_db_connection()
-        latest_datetime = None 
+        latest_datetime = None
         if conn is None:
             return latest_datetime
 
@@ -341,61 +612,792 @@ class Database:
             result = cursor.fetchone()
 
             if result:
-                timestamp_str = result[FileLogColumns.UPLOADED_YOUTUBE]
-                # Convert the ISO 8601 string to a datetime object
-                latest_datetime = datetime.fromisoformat(timestamp_str)
+                # Stored as UTC epoch seconds, returned timezone-aware
+                latest_datetime = from_epoch(result[FileLogColumns.UPLOADED_YOUTUBE])
 
         except sqlite3.Error as e:
             print(f"Error retrieving latest YouTube upload timestamp: {e}")
-        except ValueError as e:
-            # Handle cases where the timestamp string might be malformed
-            print(f"Error parsing timestamp from database: {e}")
-            latest_datetime = None
-        finally:
-            conn.close()
         return latest_datetime
-    
+
+    @staticmethod
+    def get_youtube_upload_timestamps(start: datetime, end: datetime | None = None) -> list[datetime]:
+        """
+        Retrieves the scheduled YouTube upload times within a time range, oldest first.
+        Besides finished uploads this includes the slots reserved by uploads still in progress
+        or waiting for a retry, so concurrent uploaders never pick the same slot.
+
+        Args:
+            start (datetime): Inclusive lower bound.
+            end (datetime | None): Exclusive upper bound, or None for no upper bound.
+        Returns:
+            list[datetime]: Timezone-aware (UTC) datetimes. Empty if none are found or an error occurs.
+        """
+        conn = Database.get_db_connection()
+        timestamps = []
+        if conn is None:
+            return timestamps
+
+        query = f"""
+            SELECT publish_time FROM (
+                SELECT {FileLogColumns.UPLOADED_YOUTUBE} AS publish_time
+                FROM file_logs
+                WHERE {FileLogColumns.UPLOADED_YOUTUBE} IS NOT NULL
+                UNION ALL
+                SELECT u.{YoutubeUploadColumns.PUBLISH_AT}
+                FROM youtube_uploads u JOIN file_logs f ON f.{FileLogColumns.ID} = u.{YoutubeUploadColumns.LOG_ID}
+                WHERE u.{YoutubeUploadColumns.PUBLISH_AT} IS NOT NULL AND u.{YoutubeUploadColumns.DEAD_LETTER} = 0
+                    AND f.{FileLogColumns.UPLOADED_YOUTUBE} IS NULL
+            )
+            WHERE publish_time >= ?
+        """
+        params = [to_epoch(start)]
+        if end is not None:
+            query += " AND publish_time < ?"
+            params.append(to_epoch(end))
+        query += " ORDER BY publish_time"
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            timestamps = [from_epoch(row["publish_time"]) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error retrieving YouTube upload timestamps: {e}")
+        return timestamps
+
+    @staticmethod
+    def get_approved_but_not_youtube_uploaded_entries() -> Iterator[FileLogEntry]:
+        """
+        Streams all log entries that have been 'ACCEPTED' for review
+        but have not yet been marked as uploaded to YouTube (uploaded_youtube IS NULL), oldest first.
+        Entries whose upload is dead-lettered or still backing off after a failure are left out.
+
+        Returns:
+            Iterator[FileLogEntry]: The matching entries, fetched page by page.
+                                    Yields nothing if no such entries are found or an error occurs.
+        """
+        return Database.iter_file_logs(reviewed=ReviewStatus.ACCEPTED, uploaded=False, upload_eligible=True)
+
+    @staticmethod
+    def create_generation_job(prompt: str, file_name: str, fetch_url: str | None,
+                              eta: float | None, output_url: str | None = None) -> int | None:
+        """
+        Journals a render as soon as it has been submitted, so its result isn't lost on a crash.
+        The status is Processing, or Downloading when the output URL is already known.
+
+        Args:
+            prompt (str): The prompt that was rendered.
+            file_name (str): The file name the clip will be downloaded to.
+            fetch_url (str | None): The URL to poll for the result.
+            eta (float | None): The ETA in seconds reported by the provider.
+            output_url (str | None): The URL of the finished clip, if already done.
+        Returns:
+            int | None: The ID of the new job, or None if an error occurs.
+        """
+        try:
+            current_timestamp = now_epoch()
+            status = GenerationJobStatus.PROCESSING if output_url is None else GenerationJobStatus.DOWNLOADING
+            with Database.transaction() as conn:
+                cursor = conn.execute(
+                    f'''
+                    INSERT INTO generation_jobs (
+                        {GenerationJobColumns.PROMPT},
+                        {GenerationJobColumns.FETCH_URL},
+                        {GenerationJobColumns.STATUS},
+                        {GenerationJobColumns.ETA},
+                        {GenerationJobColumns.OUTPUT_URL},
+                        {GenerationJobColumns.FILE_NAME},
+                        {GenerationJobColumns.CREATED_TIMESTAMP},
+                        {GenerationJobColumns.UPDATED_TIMESTAMP}
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (prompt, fetch_url, status.value, eta, output_url, file_name, current_timestamp, current_timestamp)
+                )
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"Error journaling generation job: {e}")
+            return None
+
+    @staticmethod
+    def update_generation_job(job_id: int, status: GenerationJobStatus,
+                              output_url: str | None = None, increment_attempts: bool = False):
+        """
+        Updates the status of a generation job, and its output URL when given.
+
+        Args:
+            job_id (int): The ID of the job to update.
+            status (GenerationJobStatus): The new status.
+            output_url (str | None): The URL of the finished clip, kept unchanged if None.
+            increment_attempts (bool): Whether this update starts a new attempt (e.g. a resume).
+        """
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    UPDATE generation_jobs
+                    SET {GenerationJobColumns.STATUS} = ?,
+                        {GenerationJobColumns.OUTPUT_URL} = COALESCE(?, {GenerationJobColumns.OUTPUT_URL}),
+                        {GenerationJobColumns.ATTEMPTS} = {GenerationJobColumns.ATTEMPTS} + ?,
+                        {GenerationJobColumns.UPDATED_TIMESTAMP} = ?
+                    WHERE {GenerationJobColumns.ID} = ?
+                    ''',
+                    (status.value, output_url, 1 if increment_attempts else 0, now_epoch(), job_id)
+                )
+        except sqlite3.Error as e:
+            print(f"Error updating generation job {job_id}: {e}")
+
+    @staticmethod
+    def get_logged_file_names(file_names: Iterable[str]) -> set[str]:
+        """
+        Returns which of the given clips already have a log entry.
+
+        Raises:
+            sqlite3.Error: If the lookup fails, so a clip isn't logged twice on a guess.
+        """
+        file_names = list(file_names)
+        conn = Database.get_db_connection()
+        if conn is None:
+            raise sqlite3.OperationalError(f"Could not connect to {DATABASE_NAME}")
+        logged = set()
+        for start in range(0, len(file_names), 500):
+            chunk = file_names[start:start + 500]
+            cursor = conn.execute(
+                f"SELECT {FileLogColumns.FILENAME} FROM file_logs WHERE {FileLogColumns.FILENAME} IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            logged.update(row[0] for row in cursor.fetchall())
+        return logged
+
+    @staticmethod
+    def complete_generation_jobs(file_names: Iterable[str]) -> int:
+        """
+        Marks the jobs that downloaded the given clips as Completed. Meant to run in the same
+        transaction that logs the clips, so a crash can't leave a paid clip that is neither
+        logged nor resumed.
+
+        Args:
+            file_names (Iterable[str]): The clips that were logged.
+        Returns:
+            int: The number of jobs completed.
+        Raises:
+            sqlite3.Error: If the update fails, so the enclosing transaction is rolled back.
+        """
+        rows = [(GenerationJobStatus.COMPLETED.value, now_epoch(), file_name, GenerationJobStatus.DOWNLOADING.value)
+                for file_name in file_names]
+        with Database.transaction() as conn:
+            cursor = conn.executemany(
+                f'''
+                UPDATE generation_jobs
+                SET {GenerationJobColumns.STATUS} = ?,
+                    {GenerationJobColumns.UPDATED_TIMESTAMP} = ?
+                WHERE {GenerationJobColumns.FILE_NAME} = ? AND {GenerationJobColumns.STATUS} = ?
+                ''',
+                rows
+            )
+            return cursor.rowcount
+
     @staticmethod
-    def get_approved_but_not_youtube_uploaded_entries() -> list[FileLogEntry]:
+    def get_unfinished_generation_jobs() -> list[GenerationJob]:
         """
-        Retrieves all log entries that have been 'ACCEPTED' for review
-        but have not yet been marked as uploaded to YouTube (uploaded_youtube IS NULL).
+        Retrieves all generation jobs that are still Processing or Downloading,
+        i.e. renders that were paid for but whose clip hasn't been stored yet.
 
         Returns:
-            list[FileLogEntry]: A list of FileLogEntry objects matching the criteria.
-                                Returns an empty list if no such entries are found
-                                or an error occurs.
+            list[GenerationJob]: The unfinished jobs, oldest first.
+                                 Returns an empty list if none are found or an error occurs.
         """
         conn = Database.get_db_connection()
-        approved_not_uploaded_entries = []
+        unfinished_jobs = []
         if conn is None:
-            return approved_not_uploaded_entries
+            return unfinished_jobs
 
         try:
             cursor = conn.cursor()
-            select_columns = ", ".join([
-                FileLogColumns.ID,
-                FileLogColumns.DESCRIPTION,
-                FileLogColumns.FILENAME,
-                FileLogColumns.CREATION_TIMESTAMP,
-                FileLogColumns.UPLOADED_YOUTUBE,
-                FileLogColumns.REVIEWED
-            ])
             cursor.execute(f"""
-                    SELECT {select_columns}
-                    FROM file_logs
-                    WHERE {FileLogColumns.UPLOADED_YOUTUBE} IS NULL
-                      AND {FileLogColumns.REVIEWED} = ?
-                    ORDER BY {FileLogColumns.CREATION_TIMESTAMP} ASC
-                """, (ReviewStatus.ACCEPTED.value,)) # Pass the value for 'Accepted' status
-            rows = cursor.fetchall()
+                    SELECT *
+                    FROM generation_jobs
+                    WHERE {GenerationJobColumns.STATUS} IN (?, ?)
+                    ORDER BY {GenerationJobColumns.ID} ASC
+                """, (GenerationJobStatus.PROCESSING.value, GenerationJobStatus.DOWNLOADING.value))
+            for row in cursor.fetchall():
+                unfinished_jobs.append(GenerationJob(**row))
+        except sqlite3.Error as e:
+            print(f"Error retrieving unfinished generation jobs: {e}")
+        return unfinished_jobs
 
-            for row in rows:
-                # Instantiate FileLogEntry object directly from the sqlite3.Row object
-                approved_not_uploaded_entries.append(FileLogEntry(**row))
+    @staticmethod
+    def save_youtube_upload_session(log_id: int, session_uri: str, progress: int, publish_at: datetime | None):
+        """
+        Stores the resumable session of an upload and how far it got, replacing any earlier session.
 
+        Args:
+            log_id (int): The ID of the log entry being uploaded.
+            session_uri (str): The resumable session URI.
+            progress (int): The number of bytes the server has acknowledged.
+            publish_at (datetime | None): The publish time the session was created with.
+        """
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    INSERT INTO youtube_uploads (
+                        {YoutubeUploadColumns.LOG_ID},
+                        {YoutubeUploadColumns.SESSION_URI},
+                        {YoutubeUploadColumns.PROGRESS},
+                        {YoutubeUploadColumns.PUBLISH_AT},
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                    )
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT ({YoutubeUploadColumns.LOG_ID}) DO UPDATE SET
+                        {YoutubeUploadColumns.SESSION_URI} = excluded.{YoutubeUploadColumns.SESSION_URI},
+                        {YoutubeUploadColumns.PROGRESS} = excluded.{YoutubeUploadColumns.PROGRESS},
+                        {YoutubeUploadColumns.PUBLISH_AT} = excluded.{YoutubeUploadColumns.PUBLISH_AT},
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP} = excluded.{YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                    ''',
+                    (log_id, session_uri, progress, to_epoch(publish_at) if publish_at else None, now_epoch())
+                )
         except sqlite3.Error as e:
-            print(f"Error retrieving approved but not uploaded entries: {e}")
-        finally:
-            conn.close()
-        return approved_not_uploaded_entries
\ No newline at end of file
+            print(f"Error saving upload session for log ID {log_id}: {e}")
+
+    @staticmethod
+    def reserve_youtube_upload_slot(log_id: int, publish_at: datetime, lease_until: datetime | None = None):
+        """
+        Reserves a publish time for an upload before it starts, so get_youtube_upload_timestamps()
+        reports it to every other uploader.
+
+        Args:
+            log_id (int): The ID of the log entry to upload.
+            publish_at (datetime): The reserved publish time.
+            lease_until (datetime | None): Keeps upload_youtube() away from the entry until then,
+                while another path (a direct stream) uploads it.
+        Raises:
+            sqlite3.Error: If the reservation can't be stored, so the slot isn't used unreserved.
+        """
+        with Database.transaction() as conn:
+            conn.execute(
+                f'''
+                INSERT INTO youtube_uploads (
+                    {YoutubeUploadColumns.LOG_ID},
+                    {YoutubeUploadColumns.PUBLISH_AT},
+                    {YoutubeUploadColumns.NEXT_ATTEMPT_AT},
+                    {YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                )
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT ({YoutubeUploadColumns.LOG_ID}) DO UPDATE SET
+                    {YoutubeUploadColumns.PUBLISH_AT} = excluded.{YoutubeUploadColumns.PUBLISH_AT},
+                    {YoutubeUploadColumns.NEXT_ATTEMPT_AT} = excluded.{YoutubeUploadColumns.NEXT_ATTEMPT_AT},
+                    {YoutubeUploadColumns.UPDATED_TIMESTAMP} = excluded.{YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                ''',
+                (log_id, to_epoch(publish_at), to_epoch(lease_until) if lease_until else None, now_epoch())
+            )
+
+    @staticmethod
+    def release_youtube_upload_slot(log_id: int):
+        """
+        Frees the publish time reserved for an upload that didn't start a session, so the gap is
+        filled by the next upload. A time sent with a session stays, it can't change anymore.
+        """
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    UPDATE youtube_uploads
+                    SET {YoutubeUploadColumns.PUBLISH_AT} = NULL,
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP} = ?
+                    WHERE {YoutubeUploadColumns.LOG_ID} = ? AND {YoutubeUploadColumns.SESSION_URI} IS NULL
+                    ''',
+                    (now_epoch(), log_id)
+                )
+        except sqlite3.Error as e:
+            print(f"Error releasing the upload slot of log ID {log_id}: {e}")
+
+    @staticmethod
+    def deny_broken_clip(file_name: str):
+        """
+        Denies the log entries of a clip found to be broken before it was uploaded and frees their
+        reserved publish times, so it isn't retried or counted as queued.
+
+        Args:
+            file_name (str): The clip in the clip folder.
+        """
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    UPDATE youtube_uploads
+                    SET {YoutubeUploadColumns.PUBLISH_AT} = NULL,
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP} = ?
+                    WHERE {YoutubeUploadColumns.SESSION_URI} IS NULL AND {YoutubeUploadColumns.LOG_ID} IN (
+                        SELECT {FileLogColumns.ID} FROM file_logs
+                        WHERE {FileLogColumns.FILENAME} = ? AND {FileLogColumns.UPLOADED_YOUTUBE} IS NULL
+                    )
+                    ''',
+                    (now_epoch(), file_name)
+                )
+                cursor = conn.execute(
+                    f'''
+                    UPDATE file_logs
+                    SET {FileLogColumns.REVIEWED} = ?
+                    WHERE {FileLogColumns.FILENAME} = ? AND {FileLogColumns.UPLOADED_YOUTUBE} IS NULL
+                    ''',
+                    (ReviewStatus.DENIED.value, file_name)
+                )
+            if cursor.rowcount:
+                print(f"Denied {cursor.rowcount} log entries of broken clip {file_name}.")
+        except sqlite3.Error as e:
+            print(f"Error denying broken clip {file_name}: {e}")
+
+    @staticmethod
+    def set_youtube_upload_video_id(log_id: int, video_id: str):
+        """
+        Records the ID of the video created by a finished upload, so it is never inserted twice.
+
+        Args:
+            log_id (int): The ID of the log entry that was uploaded.
+            video_id (str): The ID of the created video.
+        """
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    INSERT INTO youtube_uploads (
+                        {YoutubeUploadColumns.LOG_ID},
+                        {YoutubeUploadColumns.VIDEO_ID},
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                    )
+                    VALUES (?, ?, ?)
+                    ON CONFLICT ({YoutubeUploadColumns.LOG_ID}) DO UPDATE SET
+                        {YoutubeUploadColumns.VIDEO_ID} = excluded.{YoutubeUploadColumns.VIDEO_ID},
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP} = excluded.{YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                    ''',
+                    (log_id, video_id, now_epoch())
+                )
+        except sqlite3.Error as e:
+            print(f"Error recording video ID for log ID {log_id}: {e}")
+
+    @staticmethod
+    def get_youtube_upload(log_id: int) -> YoutubeUpload | None:
+        """
+        Retrieves the upload session of a log entry.
+
+        Args:
+            log_id (int): The ID of the log entry.
+        Returns:
+            YoutubeUpload | None: The stored session, or None if there is none or an error occurs.
+        """
+        conn = Database.get_db_connection()
+        if conn is None:
+            return None
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM youtube_uploads WHERE {YoutubeUploadColumns.LOG_ID} = ?", (log_id,))
+            row = cursor.fetchone()
+            return YoutubeUpload(**row) if row else None
+        except sqlite3.Error as e:
+            print(f"Error retrieving upload session for log ID {log_id}: {e}")
+            return None
+
+    @staticmethod
+    def consume_api_quota(api: str, cost: int, limit: int, window_start: datetime) -> bool:
+        """
+        Atomically spends `cost` units of a quota if that stays within `limit`.
+        Units spent in an earlier window are forgotten, so the quota refills when the window changes.
+
+        Args:
+            api (str): Name of the quota.
+            cost (int): Units the call costs.
+            limit (int): Units available per window.
+            window_start (datetime): Start of the current quota window.
+        Returns:
+            bool: True if the units were spent, False if the quota doesn't have them left.
+                  Also True if the database can't be reached, so accounting never blocks uploads.
+        """
+        start = to_epoch(window_start)
+        try:
+            with Database.transaction() as conn:
+                row = conn.execute(
+                    f"SELECT {ApiQuotaColumns.WINDOW_START}, {ApiQuotaColumns.USED} FROM api_quota WHERE {ApiQuotaColumns.API} = ?",
+                    (api,)
+                ).fetchone()
+                used = row[ApiQuotaColumns.USED] if row and row[ApiQuotaColumns.WINDOW_START] == start else 0
+                if used + cost > limit:
+                    return False
+                Database._set_api_quota_used(conn, api, start, used + cost)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error consuming {api} quota: {e}")
+            return True
+
+    @staticmethod
+    def exhaust_api_quota(api: str, limit: int, window_start: datetime):
+        """
+        Marks a quota as used up for the current window, e.g. after the API reported it exceeded.
+
+        Args:
+            api (str): Name of the quota.
+            limit (int): Units available per window.
+            window_start (datetime): Start of the current quota window.
+        """
+        try:
+            with Database.transaction() as conn:
+                Database._set_api_quota_used(conn, api, to_epoch(window_start), limit)
+        except sqlite3.Error as e:
+            print(f"Error exhausting {api} quota: {e}")
+
+    @staticmethod
+    def get_api_quota_used(api: str, window_start: datetime) -> int:
+        """
+        Returns the units of a quota spent in the window starting at `window_start`, 0 on error.
+        """
+        conn = Database.get_db_connection()
+        if conn is None:
+            return 0
+
+        try:
+            row = conn.execute(
+                f"SELECT {ApiQuotaColumns.USED} FROM api_quota WHERE {ApiQuotaColumns.API} = ? AND {ApiQuotaColumns.WINDOW_START} = ?",
+                (api, to_epoch(window_start))
+            ).fetchone()
+            return row[ApiQuotaColumns.USED] if row else 0
+        except sqlite3.Error as e:
+            print(f"Error retrieving {api} quota: {e}")
+            return 0
+
+    @staticmethod
+    def _set_api_quota_used(conn: sqlite3.Connection, api: str, window_start: int, used: int):
+        conn.execute(
+            f'''
+            INSERT INTO api_quota ({ApiQuotaColumns.API}, {ApiQuotaColumns.WINDOW_START}, {ApiQuotaColumns.USED})
+            VALUES (?, ?, ?)
+            ON CONFLICT ({ApiQuotaColumns.API}) DO UPDATE SET
+                {ApiQuotaColumns.WINDOW_START} = excluded.{ApiQuotaColumns.WINDOW_START},
+                {ApiQuotaColumns.USED} = excluded.{ApiQuotaColumns.USED}
+            ''',
+            (api, window_start, used)
+        )
+
+    @staticmethod
+    def record_youtube_upload_failure(log_id: int, attempts: int, error: str,
+                                      next_attempt_at: datetime | None, dead_letter: bool):
+        """
+        Records a failed upload attempt, keeping any stored session so the retry can resume it.
+
+        Args:
+            log_id (int): The ID of the log entry that failed to upload.
+            attempts (int): Failed attempts so far, including this one.
+            error (str): What went wrong.
+            next_attempt_at (datetime | None): No retry before this time.
+            dead_letter (bool): Whether to stop retrying the upload altogether.
+        """
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    INSERT INTO youtube_uploads (
+                        {YoutubeUploadColumns.LOG_ID},
+                        {YoutubeUploadColumns.ATTEMPTS},
+                        {YoutubeUploadColumns.LAST_ERROR},
+                        {YoutubeUploadColumns.NEXT_ATTEMPT_AT},
+                        {YoutubeUploadColumns.DEAD_LETTER},
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT ({YoutubeUploadColumns.LOG_ID}) DO UPDATE SET
+                        {YoutubeUploadColumns.ATTEMPTS} = excluded.{YoutubeUploadColumns.ATTEMPTS},
+                        {YoutubeUploadColumns.LAST_ERROR} = excluded.{YoutubeUploadColumns.LAST_ERROR},
+                        {YoutubeUploadColumns.NEXT_ATTEMPT_AT} = excluded.{YoutubeUploadColumns.NEXT_ATTEMPT_AT},
+                        {YoutubeUploadColumns.DEAD_LETTER} = excluded.{YoutubeUploadColumns.DEAD_LETTER},
+                        {YoutubeUploadColumns.UPDATED_TIMESTAMP} = excluded.{YoutubeUploadColumns.UPDATED_TIMESTAMP}
+                    ''',
+                    (log_id, attempts, error, to_epoch(next_attempt_at) if next_attempt_at else None,
+                     1 if dead_letter else 0, now_epoch())
+                )
+        except sqlite3.Error as e:
+            print(f"Error recording upload failure for log ID {log_id}: {e}")
+
+    @staticmethod
+    def get_dead_lettered_youtube_uploads() -> list[YoutubeUpload]:
+        """
+        Retrieves the uploads that failed too often and are no longer retried.
+
+        Returns:
+            list[YoutubeUpload]: The dead-lettered uploads. Empty if none are found or an error occurs.
+        """
+        conn = Database.get_db_connection()
+        dead_letters = []
+        if conn is None:
+            return dead_letters
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM youtube_uploads WHERE {YoutubeUploadColumns.DEAD_LETTER} = 1 ORDER BY {YoutubeUploadColumns.LOG_ID}")
+            dead_letters = [YoutubeUpload(**row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error retrieving dead-lettered uploads: {e}")
+        return dead_letters
+
+    @staticmethod
+    def get_review_status_counts(since: datetime) -> dict[ReviewStatus, int]:
+        """
+        Counts the log entries created since a given time by review status.
+
+        Args:
+            since (datetime): Only entries created at or after this time.
+        Returns:
+            dict[ReviewStatus, int]: Count per status, statuses without entries are left out.
+                                     Empty if an error occurs.
+        """
+        conn = Database.get_db_connection()
+        counts = {}
+        if conn is None:
+            return counts
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {FileLogColumns.REVIEWED}, COUNT(*) AS count
+                FROM file_logs
+                WHERE {FileLogColumns.CREATION_TIMESTAMP} >= ?
+                GROUP BY {FileLogColumns.REVIEWED}
+            """, (to_epoch(since),))
+            for row in cursor.fetchall():
+                counts[ReviewStatus(row[FileLogColumns.REVIEWED])] = row["count"]
+        except sqlite3.Error as e:
+            print(f"Error counting review statuses: {e}")
+        return counts
+
+    @staticmethod
+    def get_generation_job_status_counts(since: datetime) -> dict[GenerationJobStatus, int]:
+        """
+        Counts the generation jobs submitted since a given time by status.
+
+        Args:
+            since (datetime): Only jobs created at or after this time.
+        Returns:
+            dict[GenerationJobStatus, int]: Count per status, statuses without jobs are left out.
+                                            Empty if an error occurs.
+        """
+        conn = Database.get_db_connection()
+        counts = {}
+        if conn is None:
+            return counts
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {GenerationJobColumns.STATUS}, COUNT(*) AS count
+                FROM generation_jobs
+                WHERE {GenerationJobColumns.CREATED_TIMESTAMP} >= ?
+                GROUP BY {GenerationJobColumns.STATUS}
+            """, (to_epoch(since),))
+            for row in cursor.fetchall():
+                counts[GenerationJobStatus(row[GenerationJobColumns.STATUS])] = row["count"]
+        except sqlite3.Error as e:
+            print(f"Error counting generation job statuses: {e}")
+        return counts
+
+    @staticmethod
+    def get_clip_cache_entry(cache_key: str) -> ClipCacheEntry | None:
+        """
+        Retrieves a cached clip by its key.
+
+        Args:
+            cache_key (str): The hash of the render parameters.
+        Returns:
+            ClipCacheEntry | None: The entry, or None if there is none or an error occurs.
+        """
+        conn = Database.get_db_connection()
+        if conn is None:
+            return None
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM clip_cache WHERE {ClipCacheColumns.CACHE_KEY} = ?", (cache_key,))
+            row = cursor.fetchone()
+            return ClipCacheEntry(**row) if row else None
+        except sqlite3.Error as e:
+            print(f"Error retrieving clip cache entry: {e}")
+            return None
+
+    @staticmethod
+    def is_clip_claimed(file_name: str) -> bool:
+        """
+        Checks whether a clip belongs to a log entry, or to an unfinished job that will log it,
+        so serving it for another render would make it a second clip.
+
+        Args:
+            file_name (str): The clip in the clip folder.
+        Returns:
+            bool: True if the clip is claimed, or if an error occurs.
+        """
+        conn = Database.get_db_connection()
+        if conn is None:
+            return True
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT 1 FROM file_logs WHERE {FileLogColumns.FILENAME} = ?
+                UNION ALL
+                SELECT 1 FROM generation_jobs
+                WHERE {GenerationJobColumns.FILE_NAME} = ? AND {GenerationJobColumns.STATUS} IN (?, ?)
+                LIMIT 1
+            """, (file_name, file_name, GenerationJobStatus.PROCESSING.value, GenerationJobStatus.DOWNLOADING.value))
+            return cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"Error checking whether clip {file_name} is claimed: {e}")
+            return True
+
+    @staticmethod
+    def put_clip_cache_entry(cache_key: str, file_name: str, checksum: str, size: int):
+        """
+        Adds a clip to the cache, replacing any entry with the same key.
+
+        Args:
+            cache_key (str): The hash of the render parameters.
+            file_name (str): The clip in the clip folder.
+            checksum (str): SHA-256 of the clip file.
+            size (int): Size of the clip file in bytes.
+        """
+        current_timestamp = now_epoch()
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f'''
+                    INSERT OR REPLACE INTO clip_cache (
+                        {ClipCacheColumns.CACHE_KEY},
+                        {ClipCacheColumns.FILE_NAME},
+                        {ClipCacheColumns.CHECKSUM},
+                        {ClipCacheColumns.SIZE},
+                        {ClipCacheColumns.CREATED_TIMESTAMP},
+                        {ClipCacheColumns.LAST_USED_TIMESTAMP}
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ''',
+                    (cache_key, file_name, checksum, size, current_timestamp, current_timestamp)
+                )
+        except sqlite3.Error as e:
+            print(f"Error caching clip {file_name}: {e}")
+
+    @staticmethod
+    def touch_clip_cache_entry(cache_key: str):
+        """Marks a cached clip as just used, moving it to the back of the eviction order."""
+        try:
+            with Database.transaction() as conn:
+                conn.execute(
+                    f"UPDATE clip_cache SET {ClipCacheColumns.LAST_USED_TIMESTAMP} = ? WHERE {ClipCacheColumns.CACHE_KEY} = ?",
+                    (now_epoch(), cache_key)
+                )
+        except sqlite3.Error as e:
+            print(f"Error updating clip cache entry: {e}")
+
+    @staticmethod
+    def delete_clip_cache_entry(cache_key: str):
+        """Removes a clip from the cache index. The file itself is left alone."""
+        try:
+            with Database.transaction() as conn:
+                conn.execute(f"DELETE FROM clip_cache WHERE {ClipCacheColumns.CACHE_KEY} = ?", (cache_key,))
+        except sqlite3.Error as e:
+            print(f"Error deleting clip cache entry: {e}")
+
+    @staticmethod
+    def get_clip_cache_size() -> int:
+        """Returns the total size in bytes of all cached clips, 0 on error."""
+        conn = Database.get_db_connection()
+        if conn is None:
+            return 0
+
+        try:
+            return conn.execute(f"SELECT COALESCE(SUM({ClipCacheColumns.SIZE}), 0) FROM clip_cache").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error retrieving clip cache size: {e}")
+            return 0
+
+    @staticmethod
+    def get_clip_cache_eviction_candidates() -> list[ClipCacheEntry]:
+        """
+        Retrieves the cached clips that may be deleted, least recently used first.
+        Clips of log entries still waiting for review or upload are left out, and so are
+        clips of unfinished jobs, which are downloaded but not logged yet.
+
+        Returns:
+            list[ClipCacheEntry]: The candidates. Empty if none are found or an error occurs.
+        """
+        conn = Database.get_db_connection()
+        candidates = []
+        if conn is None:
+            return candidates
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM clip_cache
+                WHERE {ClipCacheColumns.FILE_NAME} NOT IN (
+                    SELECT {FileLogColumns.FILENAME} FROM file_logs
+                    WHERE {FileLogColumns.UPLOADED_YOUTUBE} IS NULL AND {FileLogColumns.REVIEWED} IN (?, ?)
+                )
+                AND {ClipCacheColumns.FILE_NAME} NOT IN (
+                    SELECT {GenerationJobColumns.FILE_NAME} FROM generation_jobs
+                    WHERE {GenerationJobColumns.STATUS} IN (?, ?)
+                )
+                ORDER BY {ClipCacheColumns.LAST_USED_TIMESTAMP} ASC
+            """, (ReviewStatus.PENDING.value, ReviewStatus.ACCEPTED.value,
+                  GenerationJobStatus.PROCESSING.value, GenerationJobStatus.DOWNLOADING.value))
+            candidates = [ClipCacheEntry(**row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error retrieving clip cache eviction candidates: {e}")
+        return candidates
+
+    @staticmethod
+    def log_metric_spans(spans: Iterable[tuple[str, str | None, int, float, int | None, bool]]) -> bool:
+        """
+        Stores timing spans in a single transaction.
+
+        Args:
+            spans (Iterable[tuple[str, str | None, int, float, int | None, bool]]):
+                (stage, subject, started epoch, duration in seconds, bytes, ok) tuples.
+        Returns:
+            bool: True if the spans were stored.
+        """
+        rows = [(stage, subject, started, duration, byte_count, int(ok))
+                for stage, subject, started, duration, byte_count, ok in spans]
+        try:
+            with Database.transaction() as conn:
+                conn.executemany(
+                    f'''
+                    INSERT INTO metrics (
+                        {MetricColumns.STAGE},
+                        {MetricColumns.SUBJECT},
+                        {MetricColumns.STARTED_TIMESTAMP},
+                        {MetricColumns.DURATION},
+                        {MetricColumns.BYTES},
+                        {MetricColumns.OK}
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ''',
+                    rows
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error storing {len(rows)} metric spans: {e}")
+            return False
+
+    @staticmethod
+    def delete_metric_spans_before(before: datetime) -> int:
+        """
+        Deletes spans that started before `before`.
+
+        Returns:
+            int: The number of deleted spans, 0 on error.
+        """
+        try:
+            with Database.transaction() as conn:
+                cursor = conn.execute(
+                    f"DELETE FROM metrics WHERE {MetricColumns.STARTED_TIMESTAMP} < ?",
+                    (to_epoch(before),)
+                )
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Error deleting old metric spans: {e}")
+            return 0
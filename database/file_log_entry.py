@@ -1,5 +1,8 @@
+from datetime import datetime
 from enum import StrEnum
 
+from database.timestamps import from_epoch
+
 class ReviewStatus(StrEnum):
      """Enum for the possible review statuses."""
      PENDING = "Pending"
@@ -10,9 +13,14 @@ class FileLogEntry:
     """
     Represents a single entry from the 'file_logs' database table.
     Provides getter methods for each column.
+    Timestamps are kept as the stored UTC epoch seconds and only turned into
+    datetime objects when a getter asks for them.
     """
+    # No per-instance __dict__, entries are created for every streamed row
+    __slots__ = ("_id", "_description", "_filename", "_creation_timestamp", "_uploaded_youtube", "_reviewed")
+
     def __init__(self, id: int, description: str, filename: str,
-                 creation_timestamp: str, uploaded_youtube: str | None,
+                 creation_timestamp: int, uploaded_youtube: int | None,
                  reviewed: str):
         self._id = id
         self._description = description
@@ -33,15 +41,23 @@ class FileLogEntry:
         """Returns the filename."""
         return self._filename
 
-    def get_creation_timestamp(self) -> str:
-        """Returns the timestamp when the entry was created (ISO 8601 format)."""
+    def get_creation_timestamp(self) -> datetime:
+        """Returns the time when the entry was created, as a timezone-aware UTC datetime."""
+        return from_epoch(self._creation_timestamp)
+
+    def get_creation_epoch(self) -> int:
+        """Returns the time when the entry was created, in UTC epoch seconds."""
         return self._creation_timestamp
 
-    def get_uploaded_youtube(self) -> str | None:
+    def get_uploaded_youtube(self) -> datetime | None:
         """
-        Returns the timestamp when the file was marked as uploaded to YouTube
-        (ISO 8601 format), or None if not yet uploaded.
+        Returns the scheduled YouTube publish time as a timezone-aware UTC datetime,
+        or None if not yet uploaded.
         """
+        return from_epoch(self._uploaded_youtube)
+
+    def get_uploaded_youtube_epoch(self) -> int | None:
+        """Returns the scheduled YouTube publish time in UTC epoch seconds, or None if not yet uploaded."""
         return self._uploaded_youtube
 
     def is_youtube_uploaded(self) -> bool:
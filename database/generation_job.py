@@ -0,0 +1,75 @@
+from datetime import datetime
+from enum import StrEnum
+
+from database.timestamps import from_epoch
+
+class GenerationJobStatus(StrEnum):
+     """Enum for the lifecycle of a submitted render."""
+     PROCESSING = "Processing"
+     DOWNLOADING = "Downloading"
+     COMPLETED = "Completed"
+     FAILED = "Failed"
+
+class GenerationJob:
+    """
+    Represents a single entry from the 'generation_jobs' database table.
+    Provides getter methods for each column.
+    """
+    def __init__(self, id: int, prompt: str, fetch_url: str | None, status: str,
+                 eta: float | None, attempts: int, output_url: str | None,
+                 file_name: str, created_timestamp: int, updated_timestamp: int):
+        self._id = id
+        self._prompt = prompt
+        self._fetch_url = fetch_url
+        self._status = GenerationJobStatus(status)
+        self._eta = eta
+        self._attempts = attempts
+        self._output_url = output_url
+        self._file_name = file_name
+        self._created_timestamp = created_timestamp
+        self._updated_timestamp = updated_timestamp
+
+    def get_id(self) -> int:
+        """Returns the ID of the job."""
+        return self._id
+
+    def get_prompt(self) -> str:
+        """Returns the prompt that was rendered."""
+        return self._prompt
+
+    def get_fetch_url(self) -> str | None:
+        """Returns the URL to poll for the render result."""
+        return self._fetch_url
+
+    def get_status(self) -> GenerationJobStatus:
+        """Returns the status as a GenerationJobStatus enum member."""
+        return self._status
+
+    def get_eta(self) -> float | None:
+        """Returns the last ETA in seconds reported by the provider."""
+        return self._eta
+
+    def get_attempts(self) -> int:
+        """Returns how many times the job has been started or resumed."""
+        return self._attempts
+
+    def get_output_url(self) -> str | None:
+        """Returns the URL of the finished clip, or None while still rendering."""
+        return self._output_url
+
+    def get_file_name(self) -> str:
+        """Returns the file name the clip is downloaded to."""
+        return self._file_name
+
+    def get_created_timestamp(self) -> datetime:
+        """Returns the time when the job was submitted, as a timezone-aware UTC datetime."""
+        return from_epoch(self._created_timestamp)
+
+    def get_updated_timestamp(self) -> datetime:
+        """Returns the time of the last status change, as a timezone-aware UTC datetime."""
+        return from_epoch(self._updated_timestamp)
+
+    def __repr__(self):
+        """Provides a string representation for debugging."""
+        return (f"GenerationJob(id={self._id}, prompt='{self._prompt}', status={self._status.value}, "
+                f"file_name='{self._file_name}', attempts={self._attempts})")
@@ -0,0 +1,244 @@
+import sqlite3
+from datetime import datetime
+from typing import Callable
+
+# --- Schema Migrations ---
+# Each migration upgrades the schema by one version and runs exactly once, inside the same
+# transaction as the version bump. The current version is kept in SQLite's user_version.
+# Migrations spell out their SQL instead of using the column enums: they describe the schema
+# as it was at that version, so never edit or reorder a released migration, append a new one.
+
+
+def _create_initial_tables(conn : sqlite3.Connection) -> None:
+    # IF NOT EXISTS: databases created before migrations existed already have these tables
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS file_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            creation_timestamp TEXT NOT NULL,
+            uploaded_youtube TEXT DEFAULT NULL,
+            reviewed TEXT DEFAULT 'Pending'
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt TEXT NOT NULL,
+            fetch_url TEXT DEFAULT NULL,
+            status TEXT NOT NULL,
+            eta REAL DEFAULT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            output_url TEXT DEFAULT NULL,
+            file_name TEXT NOT NULL,
+            created_timestamp TEXT NOT NULL,
+            updated_timestamp TEXT NOT NULL
+        )
+    ''')
+
+
+def _add_file_logs_indexes(conn : sqlite3.Connection) -> None:
+    # Pending review queue: WHERE reviewed = ? ORDER BY creation_timestamp
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_file_logs_reviewed_created ON file_logs (reviewed, creation_timestamp)")
+    # Upload queue and queue size: WHERE uploaded_youtube IS NULL AND reviewed = ? ORDER BY creation_timestamp
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_file_logs_not_uploaded ON file_logs (reviewed, creation_timestamp)
+        WHERE uploaded_youtube IS NULL
+    ''')
+    # Latest and future scheduled uploads: range scans and ORDER BY on uploaded_youtube
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_file_logs_uploaded_youtube ON file_logs (uploaded_youtube)
+        WHERE uploaded_youtube IS NOT NULL
+    ''')
+    # Startup resume only ever looks at unfinished jobs, which stay a tiny fraction of the table
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_generation_jobs_unfinished ON generation_jobs (status)
+        WHERE status IN ('Processing', 'Downloading')
+    ''')
+
+
+def _iso_to_epoch(value):
+    """SQL function for migration 3: ISO 8601 text to UTC epoch seconds, naive values are local time."""
+    if value is None or isinstance(value, int):
+        return value
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def _use_epoch_timestamps(conn : sqlite3.Connection) -> None:
+    # SQLite can't change a column's type, so both tables are rebuilt with INTEGER timestamp columns
+    conn.create_function("iso_to_epoch", 1, _iso_to_epoch, deterministic=True)
+
+    conn.execute('''
+        CREATE TABLE file_logs_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            creation_timestamp INTEGER NOT NULL,
+            uploaded_youtube INTEGER DEFAULT NULL,
+            reviewed TEXT DEFAULT 'Pending'
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO file_logs_new (id, description, filename, creation_timestamp, uploaded_youtube, reviewed)
+        SELECT id, description, filename, iso_to_epoch(creation_timestamp), iso_to_epoch(uploaded_youtube), reviewed
+        FROM file_logs
+    ''')
+    conn.execute("DROP TABLE file_logs")
+    conn.execute("ALTER TABLE file_logs_new RENAME TO file_logs")
+
+    conn.execute('''
+        CREATE TABLE generation_jobs_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt TEXT NOT NULL,
+            fetch_url TEXT DEFAULT NULL,
+            status TEXT NOT NULL,
+            eta REAL DEFAULT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            output_url TEXT DEFAULT NULL,
+            file_name TEXT NOT NULL,
+            created_timestamp INTEGER NOT NULL,
+            updated_timestamp INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO generation_jobs_new
+        SELECT id, prompt, fetch_url, status, eta, attempts, output_url, file_name,
+               iso_to_epoch(created_timestamp), iso_to_epoch(updated_timestamp)
+        FROM generation_jobs
+    ''')
+    conn.execute("DROP TABLE generation_jobs")
+    conn.execute("ALTER TABLE generation_jobs_new RENAME TO generation_jobs")
+
+    # Dropping the old tables dropped their indexes
+    _add_file_logs_indexes(conn)
+
+
+def _add_file_logs_creation_index(conn : sqlite3.Connection) -> None:
+    # Unfiltered keyset pages (view_all_logs): ORDER BY creation_timestamp, id without a sort per page
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_file_logs_created ON file_logs (creation_timestamp)")
+
+
+def _add_youtube_uploads(conn : sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE youtube_uploads (
+            log_id INTEGER PRIMARY KEY REFERENCES file_logs (id),
+            session_uri TEXT DEFAULT NULL,
+            progress INTEGER NOT NULL DEFAULT 0,
+            video_id TEXT DEFAULT NULL,
+            publish_at INTEGER DEFAULT NULL,
+            updated_timestamp INTEGER NOT NULL
+        )
+    ''')
+
+
+def _add_api_quota(conn : sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE api_quota (
+            api TEXT PRIMARY KEY,
+            window_start INTEGER NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _add_youtube_upload_retries(conn : sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE youtube_uploads ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE youtube_uploads ADD COLUMN last_error TEXT DEFAULT NULL")
+    conn.execute("ALTER TABLE youtube_uploads ADD COLUMN next_attempt_at INTEGER DEFAULT NULL")
+    conn.execute("ALTER TABLE youtube_uploads ADD COLUMN dead_letter INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_clip_cache(conn : sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE clip_cache (
+            cache_key TEXT PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_timestamp INTEGER NOT NULL,
+            last_used_timestamp INTEGER NOT NULL
+        )
+    ''')
+    # Eviction walks entries least recently used first
+    conn.execute("CREATE INDEX idx_clip_cache_last_used ON clip_cache (last_used_timestamp)")
+    # Eviction skips clips still waiting for review or upload: WHERE filename IN (...)
+    conn.execute("CREATE INDEX idx_file_logs_filename ON file_logs (filename) WHERE uploaded_youtube IS NULL")
+
+
+def _add_metrics(conn : sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT NOT NULL,
+            subject TEXT,
+            started_timestamp INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            bytes INTEGER,
+            ok INTEGER NOT NULL
+        )
+    ''')
+    # Spans are looked at, and pruned, by time range
+    conn.execute("CREATE INDEX idx_metrics_started ON metrics (started_timestamp)")
+
+
+def _index_file_logs_by_filename(conn : sqlite3.Connection) -> None:
+    # Finished clips are looked up by file name before logging, so a clip is never logged twice
+    conn.execute("DROP INDEX IF EXISTS idx_file_logs_filename")
+    conn.execute("CREATE INDEX idx_file_logs_filename ON file_logs (filename)")
+
+
+# (description, migration) pairs, the list position + 1 is the schema version the migration produces.
+MIGRATIONS : list[tuple[str, Callable[[sqlite3.Connection], None]]] = [
+    ("Create file_logs and generation_jobs", _create_initial_tables),
+    ("Index the file_logs review, upload and scheduling queries", _add_file_logs_indexes),
+    ("Store timestamps as integer UTC epochs", _use_epoch_timestamps),
+    ("Index file_logs by creation time for paginated listing", _add_file_logs_creation_index),
+    ("Create youtube_uploads for resumable upload sessions", _add_youtube_uploads),
+    ("Create api_quota for daily API quota accounting", _add_api_quota),
+    ("Track failed YouTube upload attempts for retries", _add_youtube_upload_retries),
+    ("Create clip_cache for content-addressed clip reuse", _add_clip_cache),
+    ("Create metrics for per-stage timing spans", _add_metrics),
+    ("Index every file_logs entry by file name", _index_file_logs_by_filename),
+]
+
+
+class Migrations:
+
+    @staticmethod
+    def get_version(conn : sqlite3.Connection) -> int:
+        """Returns the schema version of the database."""
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @staticmethod
+    def get_latest_version() -> int:
+        """Returns the schema version this code expects."""
+        return len(MIGRATIONS)
+
+    @staticmethod
+    def apply(conn : sqlite3.Connection) -> int:
+        """
+        Applies every pending migration in order, each in its own transaction.
+        Safe to run from several processes at once: the version is re-read after the
+        write lock is taken, so a migration is never applied twice.
+
+        Args:
+            conn (sqlite3.Connection): A connection in autocommit mode (isolation_level=None).
+        Returns:
+            int: The schema version after migrating.
+        Raises:
+            sqlite3.Error: If a migration fails. It is rolled back, earlier ones stay applied.
+        """
+        for version, (description, migration) in enumerate(MIGRATIONS, start=1):
+            if Migrations.get_version(conn) >= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if Migrations.get_version(conn) < version:
+                    migration(conn)
+                    conn.execute(f"PRAGMA user_version = {version}")
+                    print(f"Applied database migration {version}: {description}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return Migrations.get_version(conn)
@@ -0,0 +1,19 @@
+import time
+from datetime import datetime, timezone
+
+# Timestamps are stored as integer UTC Unix epochs (seconds). They compare and index as plain
+# numbers and are unambiguous across timezones. datetime objects only exist at the edges.
+
+def now_epoch() -> int:
+    """Returns the current time as UTC epoch seconds."""
+    return int(time.time())
+
+def to_epoch(value : datetime) -> int:
+    """Converts a datetime to UTC epoch seconds. Naive datetimes are taken as local time."""
+    return int(value.timestamp())
+
+def from_epoch(epoch : int | None) -> datetime | None:
+    """Converts UTC epoch seconds to a timezone-aware UTC datetime, passing None through."""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc)
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from database.timestamps import from_epoch
+
+class YoutubeUpload:
+    """
+    Represents a single entry from the 'youtube_uploads' database table.
+    Provides getter methods for each column.
+    """
+    def __init__(self, log_id: int, session_uri: str | None, progress: int, video_id: str | None,
+                 publish_at: int | None, updated_timestamp: int, attempts: int = 0,
+                 last_error: str | None = None, next_attempt_at: int | None = None, dead_letter: int = 0):
+        self._log_id = log_id
+        self._session_uri = session_uri
+        self._progress = progress
+        self._video_id = video_id
+        self._publish_at = publish_at
+        self._updated_timestamp = updated_timestamp
+        self._attempts = attempts
+        self._last_error = last_error
+        self._next_attempt_at = next_attempt_at
+        self._dead_letter = bool(dead_letter)
+
+    def get_log_id(self) -> int:
+        """Returns the ID of the log entry being uploaded."""
+        return self._log_id
+
+    def get_session_uri(self) -> str | None:
+        """Returns the resumable session URI, or None if no session was started."""
+        return self._session_uri
+
+    def get_progress(self) -> int:
+        """Returns the number of bytes the server had acknowledged when last stored."""
+        return self._progress
+
+    def get_video_id(self) -> str | None:
+        """Returns the ID of the created video, or None while the upload is unfinished."""
+        return self._video_id
+
+    def get_publish_at(self) -> datetime | None:
+        """Returns the publish time the session was created with, as a timezone-aware UTC datetime."""
+        return from_epoch(self._publish_at)
+
+    def get_updated_timestamp(self) -> datetime:
+        """Returns the time of the last change, as a timezone-aware UTC datetime."""
+        return from_epoch(self._updated_timestamp)
+
+    def get_attempts(self) -> int:
+        """Returns how many upload attempts have failed."""
+        return self._attempts
+
+    def get_last_error(self) -> str | None:
+        """Returns the error of the last failed attempt."""
+        return self._last_error
+
+    def get_next_attempt_at(self) -> datetime | None:
+        """Returns the time before which the upload isn't retried, as a timezone-aware UTC datetime."""
+        return from_epoch(self._next_attempt_at)
+
+    def is_dead_letter(self) -> bool:
+        """Returns whether the upload failed too often and is no longer retried."""
+        return self._dead_letter
+
+    def __repr__(self):
+        """Provides a string representation for debugging."""
+        return (f"YoutubeUpload(log_id={self._log_id}, progress={self._progress}, "
+                f"video_id={self._video_id}, attempts={self._attempts}, dead_letter={self._dead_letter})")
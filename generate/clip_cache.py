@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+from database.database import Database
+from generate.video_generator import VideoGenerator
+
+# --- Clip Cache Configuration ---
+# Downloaded clips double as the cache, indexed in the clip_cache table by the hash of the
+# prompt and render parameters. Over the size limit the least recently used clips are deleted,
+# except those still waiting for review or upload.
+# Only clips no log entry or unfinished job claims are served, so a hit is never a second copy of
+# a clip. Those are paid renders the database lost track of, e.g. after a lost file_logs row: the
+# PromptGenerator is built from the log, so it draws their prompts again and gets them from disk.
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ClipCache:
+
+    def get_key(parameters : dict) -> str:
+        """Returns the cache key of a render: SHA-256 of its parameters as canonical JSON."""
+        canonical = json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def lookup(cache_key : str) -> str | None:
+        """
+        Returns the file name of a cached clip if it is still on disk and unchanged, and not
+        claimed by a log entry or unfinished job. Entries whose file is missing or corrupt are dropped.
+        """
+        entry = Database.get_clip_cache_entry(cache_key)
+        if entry is None or Database.is_clip_claimed(entry.get_file_name()):
+            return None
+        path = VideoGenerator.get_clip_folder() + entry.get_file_name()
+        if (not os.path.exists(path) or os.path.getsize(path) != entry.get_size()
+                or ClipCache._checksum(path) != entry.get_checksum()):
+            print(f"Warning: Cached clip {entry.get_file_name()} is missing or changed, dropping it from the cache")
+            Database.delete_clip_cache_entry(cache_key)
+            return None
+        Database.touch_clip_cache_entry(cache_key)
+        return entry.get_file_name()
+
+    def store(cache_key : str, file_name : str) -> None:
+        """Adds a downloaded clip to the cache, then evicts clips if the cache grew too large."""
+        path = VideoGenerator.get_clip_folder() + file_name
+        Database.put_clip_cache_entry(cache_key, file_name, ClipCache._checksum(path), os.path.getsize(path))
+        ClipCache.evict()
+
+    def evict(max_bytes : int = CLIP_CACHE_MAX_BYTES) -> int:
+        """
+        Deletes least recently used clips until the cache fits in `max_bytes`.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        excess = Database.get_clip_cache_size() - max_bytes
+        freed = 0
+        if excess <= 0:
+            return freed
+        for entry in Database.get_clip_cache_eviction_candidates():
+            if freed >= excess:
+                break
+            path = VideoGenerator.get_clip_folder() + entry.get_file_name()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Could not evict {path}: {e}")
+                continue
+            Database.delete_clip_cache_entry(entry.get_cache_key())
+            freed += entry.get_size()
+        print(f"Debug: Evicted {freed} bytes from the clip cache")
+        return freed
+
+    def _checksum(path : str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,144 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from generate.http_transport import HttpTransport
+
+# --- Download Configuration ---
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # 1 MiB reads and writes
+PARALLEL_SEGMENTS = 4
+MIN_PARALLEL_SIZE = 8 * 1024 * 1024 # Below this a single stream is as fast as splitting
+PART_SUFFIX = ".part"
+
+
+class Downloader:
+    """
+    Downloads files to a '.part' file next to the destination and renames them into
+    place only once their size has been verified, so a truncated file never shows up
+    under its final name. Interrupted downloads resume from what is already on disk,
+    and large new files are fetched as parallel Range segments when the server allows it.
+    """
+
+    def __init__(self, transport : HttpTransport, chunk_size : int = DOWNLOAD_CHUNK_SIZE,
+                 segments : int = PARALLEL_SEGMENTS, min_parallel_size : int = MIN_PARALLEL_SIZE):
+        self._transport = transport
+        self._chunk_size = chunk_size
+        self._segments = segments
+        self._min_parallel_size = min_parallel_size
+
+    def download(self, url : str, destination : str) -> int:
+        """
+        Downloads a file atomically.
+
+        Args:
+            url (str): The URL to download.
+            destination (str): The final path of the file.
+        Returns:
+            int: The size of the downloaded file in bytes.
+        Raises:
+            RuntimeError: If the downloaded size doesn't match the announced size.
+                The partial file is kept so the next attempt can resume it.
+        """
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        part_path = destination + PART_SUFFIX
+        size, accepts_ranges = self._probe(url)
+        have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        if size is not None and have == size:
+            pass # Already complete, e.g. written while the file was streamed elsewhere
+        elif accepts_ranges and size is not None and size >= self._min_parallel_size and self._segments > 1 and not have:
+            self._download_segments(url, part_path, size)
+        else:
+            # An existing '.part' file is resumed as a single stream
+            size = self._download_stream(url, part_path, size if accepts_ranges else None)
+
+        self._verify(part_path, size)
+        os.replace(part_path, destination)
+        return os.path.getsize(destination)
+
+    def _probe(self, url : str) -> tuple[int | None, bool]:
+        """Returns the announced size and whether byte ranges are supported."""
+        try:
+            with self._transport.request("HEAD", url, allow_redirects=True) as response:
+                if not response.ok:
+                    return None, False
+                length = response.headers.get("Content-Length")
+                accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                return (int(length) if length else None), accepts_ranges
+        except Exception as e:
+            print(f"Warning: Could not probe {url}, downloading as a single stream: {e}")
+            return None, False
+
+    def _download_stream(self, url : str, part_path : str, size : int | None) -> int | None:
+        """
+        Downloads as a single stream, resuming an existing '.part' file when the size is known.
+
+        Returns:
+            int | None: The expected total size, or None if the server didn't announce one.
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size is None or offset >= size:
+            offset = 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self._transport.get(url, stream=True, headers=headers) as response:
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                offset = 0 # Range ignored, start over
+            length = response.headers.get("Content-Length")
+            expected = offset + int(length) if length else size
+            if offset:
+                print(f"Debug: Resuming download of {url} at byte {offset}")
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self._chunk_size):
+                    f.write(chunk)
+        return expected
+
+    def _download_segments(self, url : str, part_path : str, size : int) -> None:
+        """Downloads `size` bytes as parallel Range requests into segment files, then joins them."""
+        segment_size = -(-size // self._segments)
+        ranges = [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+        segment_paths = [f"{part_path}{index}" for index in range(len(ranges))]
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            for future in [executor.submit(self._download_segment, url, path, start, end)
+                           for path, (start, end) in zip(segment_paths, ranges)]:
+                future.result()
+
+        with open(part_path, 'wb') as f:
+            for path in segment_paths:
+                with open(path, 'rb') as segment:
+                    shutil.copyfileobj(segment, f, self._chunk_size)
+        for path in segment_paths:
+            os.remove(path)
+
+    def _download_segment(self, url : str, path : str, start : int, end : int) -> None:
+        have = os.path.getsize(path) if os.path.exists(path) else 0
+        expected = end - start + 1
+        if have == expected:
+            return
+        if have > expected:
+            have = 0
+
+        with self._transport.get(url, stream=True, headers={"Range": f"bytes={start + have}-{end}"}) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RuntimeError(f"Server ignored Range request for {url}")
+            with open(path, 'ab' if have else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self._chunk_size):
+                    f.write(chunk)
+
+        if os.path.getsize(path) != expected:
+            raise RuntimeError(f"Segment {start}-{end} of {url} is incomplete")
+
+    def _verify(self, part_path : str, expected : int | None) -> None:
+        actual = os.path.getsize(part_path)
+        if expected is None:
+            if actual == 0:
+                os.remove(part_path)
+                raise RuntimeError(f"Downloaded file {part_path} is empty")
+            return
+        if actual > expected:
+            os.remove(part_path) # Can't be resumed, start from scratch next time
+        if actual != expected:
+            raise RuntimeError(f"Downloaded {actual} bytes to {part_path}, expected {expected}")
@@ -0,0 +1,292 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator
+
+from generate.video_generator import VideoGenerator
+from metrics.metrics import Metrics
+
+# --- Provider Health ---
+# After this many failures in a row a provider is skipped for the cooldown, then it gets one
+# render to prove itself again. Any success resets the count.
+MAX_CONSECUTIVE_FAILURES = 3
+UNHEALTHY_COOLDOWN = 15 * 60 # seconds
+
+# --- Hedging ---
+# With hedging on, a render still running after the HEDGE_PERCENTILE latency of its provider
+# is sent to a second provider as well and whichever clip comes first is used. Renders are
+# paid, so it is off unless GENERATION_HEDGING=1. The slower clip is discarded by its provider.
+HEDGING = os.getenv("GENERATION_HEDGING") == "1"
+HEDGE_PERCENTILE = 0.95
+LATENCY_WINDOW = 50 # Recent render latencies kept per provider
+MIN_LATENCY_SAMPLES = 10 # No hedging before a provider's latency is known
+
+BLOCKING_WORKERS = 4 # Threads for providers that only implement generate()
+
+_providers = []
+_capacity = threading.Condition() # Guards every ProviderState, notified when a render slot frees up
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="generator-blocking")
+
+
+class NoProviderAvailableError(RuntimeError):
+    """Raised when no registered video provider is healthy."""
+
+
+class ProviderState:
+    """
+    A registered provider with its concurrency limit, health and recent latencies.
+    Provides getter methods for each field.
+    """
+    def __init__(self, provider: type[VideoGenerator], max_in_flight: int):
+        self._provider = provider
+        self._max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._unhealthy_until = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def get_provider(self) -> type[VideoGenerator]:
+        """Returns the provider class."""
+        return self._provider
+
+    def get_name(self) -> str:
+        """Returns the name of the provider class."""
+        return self._provider.__name__
+
+    def get_max_in_flight(self) -> int:
+        """Returns how many renders the provider may run at the same time."""
+        return self._max_in_flight
+
+    def get_in_flight(self) -> int:
+        """Returns how many renders the provider is running."""
+        return self._in_flight
+
+    def get_consecutive_failures(self) -> int:
+        """Returns how many renders failed in a row."""
+        return self._consecutive_failures
+
+    def is_healthy(self) -> bool:
+        """Returns whether the provider is outside a failure cooldown."""
+        return time.monotonic() >= self._unhealthy_until
+
+    def has_capacity(self) -> bool:
+        """Returns whether the provider can take another render."""
+        return self._in_flight < self._max_in_flight
+
+    def get_latency_percentile(self, percentile : float) -> float | None:
+        """Returns the given percentile (0-1) of recent render latencies in seconds, None while too few are known."""
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[max(0, math.ceil(percentile * len(latencies)) - 1)]
+
+    def set_max_in_flight(self, max_in_flight : int) -> None:
+        self._max_in_flight = max_in_flight
+
+    def record_start(self) -> None:
+        self._in_flight += 1
+
+    def record_success(self, latency : float) -> None:
+        self._in_flight -= 1
+        self._consecutive_failures = 0
+        self._unhealthy_until = 0.0
+        self._latencies.append(latency)
+
+    def record_failure(self) -> None:
+        self._in_flight -= 1
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            self._unhealthy_until = time.monotonic() + UNHEALTHY_COOLDOWN
+            print(f"Warning: {self.get_name()} failed {self._consecutive_failures} times in a row, "
+                  f"skipping it for {UNHEALTHY_COOLDOWN}s")
+
+    def __repr__(self):
+        """Provides a string representation for debugging."""
+        return (f"ProviderState(name={self.get_name()}, in_flight={self._in_flight}/{self._max_in_flight}, "
+                f"healthy={self.is_healthy()}, consecutive_failures={self._consecutive_failures})")
+
+
+class _Render:
+    """One prompt being rendered, by one provider or, after failover or hedging, several in turn."""
+    def __init__(self, prompt : str, stream_to : Callable[[str, Iterator[bytes]], bool] | None, hedge : bool):
+        self.prompt = prompt
+        self.stream_to = stream_to
+        self.hedge = hedge
+        self.clip = Future()
+        self.tried = []
+        self.running = 0
+        self.error = None
+        self.hedge_timer = None
+        self.lock = threading.RLock() # Reentrant, a provider may resolve its future inside submit()
+
+
+class GeneratorRegistry:
+    """
+    Spreads renders over the registered video providers. Providers are tried in registration
+    order, skipping those at their concurrency limit or in a failure cooldown. A render that
+    fails is retried on the next provider that hasn't tried it yet, unless it timed out: the
+    provider may still finish it and resumes it on the next start.
+
+    Providers are registered at startup in main.py, so local fake providers can be registered instead.
+    """
+
+    def register(provider : type[VideoGenerator], max_in_flight : int) -> None:
+        """
+        Adds a provider, after those registered before it. Registering it again updates its limit.
+
+        Args:
+            provider (type[VideoGenerator]): The provider class.
+            max_in_flight (int): How many renders it may run at the same time.
+        """
+        with _capacity:
+            for state in _providers:
+                if state.get_provider() is provider:
+                    state.set_max_in_flight(max_in_flight)
+                    _capacity.notify_all()
+                    return
+            _providers.append(ProviderState(provider, max_in_flight))
+
+    def submit(prompt : str, stream_to : Callable[[str, Iterator[bytes]], bool] | None = None,
+               hedge : bool = HEDGING) -> Future:
+        """
+        Starts a render on the first healthy provider with a free slot, waiting for one if all are busy.
+
+        Args:
+            prompt (str): The prompt to render.
+            stream_to (Callable[[str, Iterator[bytes]], bool] | None): Passed on to the provider, see
+                ModelSlab.submit. Only the first clip to finish is streamed into it.
+            hedge (bool): Whether a slow render may be sent to a second provider as well.
+        Returns:
+            Future: Resolves to the file name of the clip, or None if it was streamed.
+        Raises:
+            NoProviderAvailableError: If no provider is registered or all are in a failure cooldown.
+        """
+        if stream_to is not None:
+            stream_to = GeneratorRegistry._once(stream_to)
+        render = _Render(prompt, stream_to, hedge)
+        if not GeneratorRegistry._launch(render, wait=True):
+            raise render.error or NoProviderAvailableError("No healthy video provider is registered")
+        return render.clip
+
+    def _launch(render : _Render, wait : bool) -> bool:
+        """Starts the render on a provider it hasn't tried. Returns False if there was none to start it on."""
+        while True:
+            state = GeneratorRegistry._acquire(render.tried, wait)
+            if state is None:
+                return False
+            with render.lock:
+                render.tried.append(state)
+                render.running += 1
+            started = time.monotonic()
+            try:
+                future = GeneratorRegistry._start(state.get_provider(), render.prompt, render.stream_to)
+            except Exception as e:
+                print(f"Warning: Submitting '{render.prompt}' to {state.get_name()} failed: {e}")
+                GeneratorRegistry._release(state, None)
+                with render.lock:
+                    render.running -= 1
+                    render.error = e
+                continue
+            future.add_done_callback(lambda future: GeneratorRegistry._on_done(render, state, started, future))
+            if render.hedge and len(render.tried) == 1:
+                GeneratorRegistry._schedule_hedge(render, state)
+            return True
+
+    def _start(provider : type[VideoGenerator], prompt : str, stream_to : Callable[[str, Iterator[bytes]], bool] | None) -> Future:
+        if provider.ASYNC_SUBMIT:
+            return provider.submit(prompt, stream_to)
+        # Blocking providers write the clip to disk, the caller logs it like any downloaded clip
+        return _blocking_pool.submit(provider.generate, prompt)
+
+    def _acquire(tried : list[ProviderState], wait : bool) -> ProviderState | None:
+        """Takes a render slot on the preferred healthy provider not in `tried`."""
+        with _capacity:
+            while True:
+                candidates = [state for state in _providers if state not in tried and state.is_healthy()]
+                if not candidates:
+                    return None
+                for state in candidates:
+                    if state.has_capacity():
+                        state.record_start()
+                        return state
+                if not wait:
+                    return None
+                # Re-checked at least every minute, a cooldown may also have ended meanwhile
+                _capacity.wait(timeout=60)
+
+    def _release(state : ProviderState, latency : float | None) -> None:
+        """Frees a render slot and records how the render went, `latency` is None for a failure."""
+        with _capacity:
+            if latency is None:
+                state.record_failure()
+            else:
+                state.record_success(latency)
+            _capacity.notify_all()
+
+    def _on_done(render : _Render, state : ProviderState, started : float, future : Future) -> None:
+        error = future.exception()
+        GeneratorRegistry._release(state, None if error else time.monotonic() - started)
+        with render.lock:
+            render.running -= 1
+            finished_second = render.clip.done()
+            if not finished_second:
+                if error is None:
+                    if render.hedge_timer is not None:
+                        render.hedge_timer.cancel()
+                    render.clip.set_result(future.result())
+                    return
+                print(f"Warning: {state.get_name()} failed to render '{render.prompt}': {error}")
+                render.error = error
+                if render.running > 0:
+                    return # A hedged render is still running
+                if isinstance(error, TimeoutError):
+                    # The provider may still finish it and resumes it on the next start, another render would be paid twice
+                    render.clip.set_exception(error)
+                    return
+        if finished_second:
+            if error is None and future.result() is not None:
+                print(f"Debug: {state.get_name()} finished '{render.prompt}' after another provider, keeping the first clip")
+                # Outside the lock, the provider may touch the database
+                state.get_provider().discard(future.result())
+            return
+        # The next provider may be busy, wait for a slot on a thread of our own, not the provider's
+        threading.Thread(target=GeneratorRegistry._fail_over, args=(render,), name="generator-failover", daemon=True).start()
+
+    def _fail_over(render : _Render) -> None:
+        if GeneratorRegistry._launch(render, wait=True):
+            Metrics.increment("render_failovers")
+            return
+        with render.lock:
+            if render.running == 0 and not render.clip.done():
+                render.clip.set_exception(render.error)
+
+    def _schedule_hedge(render : _Render, state : ProviderState) -> None:
+        with _capacity:
+            threshold = state.get_latency_percentile(HEDGE_PERCENTILE)
+        if threshold is None:
+            return
+        with render.lock:
+            render.hedge_timer = threading.Timer(threshold, GeneratorRegistry._hedge, args=(render,))
+            render.hedge_timer.daemon = True
+            render.hedge_timer.start()
+
+    def _hedge(render : _Render) -> None:
+        with render.lock:
+            if render.clip.done():
+                return
+        if GeneratorRegistry._launch(render, wait=False):
+            Metrics.increment("render_hedges")
+            print(f"Debug: '{render.prompt}' is slow on {render.tried[0].get_name()}, "
+                  f"also sending it to {render.tried[-1].get_name()}")
+
+    def _once(stream_to : Callable[[str, Iterator[bytes]], bool]) -> Callable[[str, Iterator[bytes]], bool]:
+        """Lets only the first caller stream, later ones are told the clip wasn't consumed and download it."""
+        claimed = threading.Lock()
+        def stream_once(file_name : str, chunks : Iterator[bytes]) -> bool:
+            if not claimed.acquire(blocking=False):
+                return False
+            return stream_to(file_name, chunks)
+        return stream_once
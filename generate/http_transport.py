@@ -0,0 +1,106 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Transport Configuration ---
+POOL_SIZE = 16 # Keep-alive connections kept per host
+DEFAULT_TIMEOUT = (10, 60) # (connect, read) seconds
+MAX_RETRIES = 4
+BACKOFF_BASE = 1 # seconds, doubled on every retry
+BACKOFF_MAX = 60 # seconds
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses where the server guarantees the request was not acted upon, safe to retry even for non-idempotent calls
+REJECTED_STATUSES = {429, 503}
+
+
+class HttpTransport:
+    """
+    Session-backed HTTP client shared by the generators.
+    Reuses keep-alive connections, applies a timeout to every call and retries
+    transient failures with exponential backoff, honoring Retry-After. A response asking
+    for a longer wait than BACKOFF_MAX is returned instead of retried early.
+    """
+
+    def __init__(self, pool_size : int = POOL_SIZE, timeout : tuple[float, float] = DEFAULT_TIMEOUT,
+                 max_retries : int = MAX_RETRIES):
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def request(self, method : str, url : str, idempotent : bool = True, max_retries : int | None = None,
+                **kwargs) -> requests.Response:
+        """
+        Sends a request, retrying transient failures.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL to call.
+            idempotent (bool): Whether the call may be repeated safely. Non-idempotent calls
+                (e.g. submitting a paid render) are only retried when the server cannot have
+                acted on them: connect timeouts and 429/503 responses.
+            max_retries (int | None): Overrides the transport's retry limit, 0 to fail fast.
+            **kwargs: Passed on to requests.Session.request, 'timeout' overrides the default.
+        Returns:
+            requests.Response: The last response received, which may still be an error status,
+                e.g. when Retry-After asks for a longer wait than BACKOFF_MAX.
+        """
+        kwargs.setdefault("timeout", self._timeout)
+        retry_statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+        max_retries = self._max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Warning: {method} {url} failed ({e}), retrying in {delay:.1f} seconds")
+            else:
+                if response.status_code not in retry_statuses or attempt >= max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is not None and delay > BACKOFF_MAX:
+                    print(f"Warning: {method} {url} returned {response.status_code} asking to wait {delay:.0f} seconds, giving up")
+                    return response
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+                print(f"Warning: {method} {url} returned {response.status_code}, retrying in {delay:.1f} seconds")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url : str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url : str, idempotent : bool = True, **kwargs) -> requests.Response:
+        return self.request("POST", url, idempotent=idempotent, **kwargs)
+
+    def _backoff(self, attempt : int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def _retry_after(self, response : requests.Response) -> float | None:
+        """Parses the Retry-After header, given either in seconds or as an HTTP date."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
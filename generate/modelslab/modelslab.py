@@ -1,53 +1,283 @@
+import itertools
 import json
 import os
+import sqlite3
 import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator
 
-import requests
-
+from database.database import Database
+from database.generation_job import GenerationJob, GenerationJobStatus
+from generate.clip_cache import ClipCache
+from generate.downloader import DOWNLOAD_CHUNK_SIZE, PART_SUFFIX, Downloader
+from generate.http_transport import HttpTransport
+from generate.mp4 import Mp4, Mp4Error
+from generate.modelslab.poller import ModelSlabPoller
+from generate.modelslab.webhook_receiver import WebhookReceiver
 from generate.video_generator import VideoGenerator
+from metrics.metrics import Metrics
+
+DOWNLOAD_WORKERS = 4
+STREAM_WORKERS = 3 # Direct-mode clips streamed into an upload at the same time, each takes as long as the upload
+MAX_JOB_ATTEMPTS = 3 # Times a render is started, the submit included, so it is resumed at most twice
+DEFAULT_API_URL = "https://modelslab.com/api/v6"
+DEFAULT_WEBHOOK_PORT = 8765
+# In webhook mode polling is only a safety net for callbacks that never arrive
+WEBHOOK_FALLBACK_POLL_DELAY = 300 # seconds
+
+# All calls share one pooled transport, one poller waits on every in-flight render
+# and finished renders are downloaded on a small pool. Streams run on a pool of their own,
+# so slow uploads never hold up downloads.
+_transport = HttpTransport()
+_poller = ModelSlabPoller(_transport)
+_downloader = Downloader(_transport)
+_download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="modelslab-download")
+_stream_pool = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="modelslab-stream")
+_webhook_receiver = None
 
 
 class ModelSlab(VideoGenerator):
 
+    ASYNC_SUBMIT = True
+
     def generate(prompt : str) -> str:
-        payload = ModelSlab._get_payload(prompt)
-        response = requests.request("POST", "https://modelslab.com/api/v6/video/text2video_ultra", headers={'Content-Type': 'application/json'}, data=payload)
-        if response.status_code == 200:
-            dict_response = json.loads(response.text)
-            dict_response = ModelSlab._wait_until_done(dict_response)
-            if dict_response["status"] == "success":
-                return ModelSlab._handle_success_response(dict_response)
+        return ModelSlab.submit(prompt).result()
+
+    def submit(prompt : str, stream_to : Callable[[str, Iterator[bytes]], bool] | None = None) -> Future:
+        """
+        Submits a render without waiting for it.
+
+        Args:
+            prompt (str): The prompt to render.
+            stream_to (Callable[[str, Iterator[bytes]], bool] | None): Direct mode. The finished clip is
+                streamed from the provider into this callable, called with the file name and the
+                chunks, instead of being written to disk. It returns whether it consumed the clip,
+                when it didn't the clip is downloaded as usual.
+        Returns:
+            Future: Resolves to the file name of the downloaded clip, or None if it was streamed.
+                Identical renders done before whose clip nothing claims are served from the clip
+                cache without submitting, resolving to the cached file name without streaming it.
+                The job stays Downloading until the caller stores the clip and completes it with
+                Database.complete_generation_jobs(), in the same transaction.
+        """
+        cache_key = ClipCache.get_key(ModelSlab._get_parameters(prompt))
+        cached_file_name = ClipCache.lookup(cache_key)
+        if cached_file_name is not None:
+            print(f"Debug: Serving '{prompt}' from the clip cache ({cached_file_name})")
+            Metrics.increment("clip_cache_hits")
+            # Already on disk, the caller logs it like a fresh download
+            clip = Future()
+            clip.set_result(cached_file_name)
+            return clip
+
+        webhook_url = os.getenv("MODELSLAB_WEBHOOK_URL")
+        track_id = uuid.uuid4().hex if webhook_url else None
+        callback = None
+        if track_id:
+            # Register before submitting, the callback may arrive before the response does
+            callback = ModelSlab._get_webhook_receiver().register(track_id)
+
+        Metrics.increment("clip_cache_misses")
+        payload = ModelSlab._get_payload(prompt, webhook_url, track_id)
+        with Metrics.span("render_submit", subject=prompt):
+            # Not idempotent: a repeated submit is a second paid render
+            response = _transport.post(ModelSlab._get_api_url() + "/video/text2video_ultra", idempotent=False, headers={'Content-Type': 'application/json'}, data=payload)
+            dict_response = json.loads(response.text) if response.status_code == 200 else None
+            if dict_response is None or dict_response["status"] not in ("processing", "success"):
+                if track_id:
+                    _webhook_receiver.forget(track_id)
+                raise RuntimeError(dict_response or response)
+
+        file_name = ModelSlab._get_file_name(dict_response)
+        output_url = dict_response["output"][0] if dict_response["status"] == "success" else None
+        job_id = Database.create_generation_job(prompt, file_name, dict_response.get("fetch_result"), dict_response.get("eta"), output_url)
+        return ModelSlab._track(dict_response, file_name, job_id, cache_key, callback, track_id, stream_to)
+
+    def discard(file_name : str) -> None:
+        """Completes the job of a clip that isn't used, so the next start doesn't resume and log it."""
+        try:
+            Database.complete_generation_jobs([file_name])
+        except sqlite3.Error as e:
+            print(f"Error completing the job of unused clip {file_name}: {e}")
+
+    def resume(job : GenerationJob) -> Future:
+        """
+        Picks up a journaled render after a restart, polling or downloading as needed.
+
+        Args:
+            job (GenerationJob): An unfinished job from the generation_jobs table.
+        Returns:
+            Future: Resolves to the file name of the downloaded clip.
+        """
+        if job.get_attempts() >= MAX_JOB_ATTEMPTS:
+            Database.update_generation_job(job.get_id(), GenerationJobStatus.FAILED)
+            raise RuntimeError(f"Generation job {job.get_id()} failed {job.get_attempts()} times, giving up")
+        Database.update_generation_job(job.get_id(), job.get_status(), increment_attempts=True)
+
+        if job.get_output_url() is not None:
+            response = {"status": "success", "output": [job.get_output_url()]}
+        else:
+            response = {"status": "processing", "fetch_result": job.get_fetch_url(), "eta": job.get_eta(), "id": job.get_id()}
+        cache_key = ClipCache.get_key(ModelSlab._get_parameters(job.get_prompt()))
+        return ModelSlab._track(response, job.get_file_name(), job.get_id(), cache_key)
+
+    def _track(response : dict, file_name : str, job_id : int | None, cache_key : str, callback : Future | None = None,
+               track_id : str | None = None, stream_to : Callable[[str, Iterator[bytes]], bool] | None = None) -> Future:
+        if response["status"] == "processing":
+            if callback is None:
+                render = _poller.track(response)
+            else:
+                render = _poller.track(response, first_check=max(response.get("eta") or 0, WEBHOOK_FALLBACK_POLL_DELAY))
+                callback.add_done_callback(lambda callback: _poller.resolve(render, response, callback.result()))
+        elif response["status"] == "success":
+            render = Future()
+            render.set_result(response)
         else:
             raise RuntimeError(response)
-            
-    def _wait_until_done(response : dict) -> dict:
-        while response["status"] == "processing":
-            print(f"Debug: Sleeping for {response["eta"]} seconds")
-            time.sleep(response["eta"])
-            check_response = requests.request("POST", response["fetch_result"], headers={'Content-Type': 'application/json'}, data=json.dumps({"key": os.getenv("MODELSLAB_KEY")}))
-            dict_check_response = json.loads(check_response.text)
-            if dict_check_response["status"] == "success":
-                response["status"] = "success"
-                response["output"] = dict_check_response["output"]
-            elif dict_check_response["status"] == "error":
-                raise RuntimeError(dict_check_response)
-        return response
-            
-
-    def _handle_success_response(response : dict) -> str:
+        if track_id is not None:
+            # The poller may finish the render first, the callback won't be waited for anymore
+            render.add_done_callback(lambda render: _webhook_receiver.forget(track_id))
+
+        # From submit (or resume) until the provider reports the render done
+        tracked = time.monotonic()
+        render.add_done_callback(lambda render: Metrics.record("render", time.monotonic() - tracked, file_name, ok=render.exception() is None))
+        clip = Future()
+        render.add_done_callback(lambda render: _download_pool.submit(ModelSlab._on_render_done, render, clip, file_name, job_id, cache_key, stream_to))
+        return clip
+
+    def _get_api_url() -> str:
+        """Base URL of the ModelSlab API, overridable to point at a local stand-in."""
+        return os.getenv("MODELSLAB_API_URL", DEFAULT_API_URL).rstrip("/")
+
+    def _get_webhook_receiver() -> WebhookReceiver:
+        """
+        Returns the process-wide webhook receiver, starting it on first use.
+        MODELSLAB_WEBHOOK_URL must be the public URL ModelSlab can reach this receiver on.
+        """
+        global _webhook_receiver
+        if _webhook_receiver is None:
+            _webhook_receiver = WebhookReceiver(port=int(os.getenv("MODELSLAB_WEBHOOK_PORT", DEFAULT_WEBHOOK_PORT)))
+            _webhook_receiver.start()
+        return _webhook_receiver
+
+    def _on_render_done(render : Future, clip : Future, file_name : str, job_id : int | None, cache_key : str,
+                        stream_to : Callable[[str, Iterator[bytes]], bool] | None = None) -> None:
+        try:
+            response = render.result()
+        except TimeoutError as e:
+            # The render may still finish, leave the job Processing so the next start resumes it
+            clip.set_exception(e)
+            return
+        except Exception as e:
+            Database.update_generation_job(job_id, GenerationJobStatus.FAILED)
+            clip.set_exception(e)
+            return
+
+        Database.update_generation_job(job_id, GenerationJobStatus.DOWNLOADING, output_url=response["output"][0])
+        if stream_to is not None:
+            _stream_pool.submit(ModelSlab._stream_clip, response, clip, file_name, job_id, cache_key, stream_to)
+            return
+        ModelSlab._download_clip(response, clip, file_name, job_id, cache_key)
+
+    def _stream_clip(response : dict, clip : Future, file_name : str, job_id : int | None, cache_key : str,
+                     stream_to : Callable[[str, Iterator[bytes]], bool]) -> None:
+        """Streams the clip into `stream_to`, handing it to the download pool when it wasn't consumed."""
+        try:
+            if ModelSlab._stream_success_response(response, file_name, stream_to):
+                clip.set_result(None)
+                return
+        except Mp4Error as e:
+            ModelSlab._discard_broken_clip(clip, file_name, job_id, e)
+            return
+        _download_pool.submit(ModelSlab._download_clip, response, clip, file_name, job_id, cache_key)
+
+    def _download_clip(response : dict, clip : Future, file_name : str, job_id : int | None, cache_key : str) -> None:
+        try:
+            ModelSlab._handle_success_response(response, file_name)
+            ClipCache.store(cache_key, file_name)
+            clip.set_result(file_name)
+        except Mp4Error as e:
+            ModelSlab._discard_broken_clip(clip, file_name, job_id, e)
+        except Exception as e:
+            # Stays Downloading, the next start retries the download
+            clip.set_exception(e)
+
+    def _discard_broken_clip(clip : Future, file_name : str, job_id : int | None, error : Mp4Error) -> None:
+        # The render itself is broken, downloading it again won't help
+        Database.update_generation_job(job_id, GenerationJobStatus.FAILED)
+        # A failed stream has logged the clip already, it must not stay queued for upload
+        Database.deny_broken_clip(file_name)
+        clip_path = VideoGenerator.get_clip_folder() + file_name
+        for path in (clip_path, clip_path + PART_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+        clip.set_exception(error)
+
+    def _get_file_name(response : dict) -> str:
+        return response["meta"]["file_prefix"] + "." + response["meta"]["output_type"]
+
+    def _handle_success_response(response : dict, file_name : str) -> str:
         url = response["output"][0]
-        file_name = response["meta"]["file_prefix"] + "." + response["meta"]["output_type"]
-        with requests.get(url, stream=True) as file_object:
-            file_object.raise_for_status()
-            with open(VideoGenerator.get_clip_folder() + file_name, 'wb') as f:
-                # Download the file in chunks of 8KB
-                for chunk in file_object.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        path = VideoGenerator.get_clip_folder() + file_name
+        if os.path.exists(path):
+            # Downloaded before a crash but never logged, downloads only get their final name once complete
+            size = os.path.getsize(path)
+        else:
+            with Metrics.span("download", subject=file_name) as span:
+                size = _downloader.download(url, path)
+                span.set_bytes(size)
+        # Rejects broken renders and moves moov to the front, so YouTube can start processing right away
+        with Metrics.span("faststart", subject=file_name):
+            info = Mp4.make_faststart(path)
+        print(f"Debug: Downloaded {file_name} ({size} bytes, {info})")
         return file_name
 
-    def _get_payload(prompt : str) -> str:
+    def _stream_success_response(response : dict, file_name : str, stream_to : Callable[[str, Iterator[bytes]], bool]) -> bool:
+        """
+        Streams the clip into `stream_to`. Returns False if it wasn't consumed, so it can be downloaded instead.
+        Only the ftyp header is checked before streaming, the full MP4 check and faststart need the whole
+        file. The streamed bytes are spooled to the '.part' file, so the download resumes from them.
+
+        Raises:
+            Mp4Error: If the clip doesn't start like an MP4, nothing was streamed then.
+        """
+        url = response["output"][0]
+        part_path = VideoGenerator.get_clip_folder() + file_name + PART_SUFFIX
+        try:
+            with _transport.get(url, stream=True) as download:
+                download.raise_for_status()
+                chunks = download.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+                first_chunk = next(chunks, b"")
+                Mp4.check_header(first_chunk, url)
+                os.makedirs(os.path.dirname(part_path) or ".", exist_ok=True)
+                with open(part_path, 'wb') as spool:
+                    def spooled() -> Iterator[bytes]:
+                        for chunk in itertools.chain([first_chunk], chunks):
+                            spool.write(chunk)
+                            yield chunk
+                    consumed = stream_to(file_name, spooled())
+            if consumed:
+                os.remove(part_path)
+                return True
+        except Mp4Error:
+            raise
+        except Exception as e:
+            print(f"Warning: Streaming {url} failed: {e}")
+        print(f"Debug: Downloading {url} to disk instead")
+        return False
+
+    def _get_payload(prompt : str, webhook : str | None = None, track_id : str | None = None) -> str:
         return json.dumps({
             "key": os.getenv("MODELSLAB_KEY"),
+            **ModelSlab._get_parameters(prompt),
+            "webhook": webhook,
+            "track_id": track_id
+        })
+
+    def _get_parameters(prompt : str) -> dict:
+        """The render settings, everything in the payload that decides what the clip looks like."""
+        return {
             "prompt": prompt,
             #"blurry, low quality, pixelated, deformed, mutated, disfigured, bad anatomy, extra limbs, missing limbs, unrealistic motion, glitch, noisy, oversaturated, underexposed, overexposed, poor lighting, low contrast, unnatural colors, jpeg artifacts, watermark, text, signature, cut off, cropped, stretched, distorted face, bad proportions, duplicated limbs, broken body, grain, flickering, frame skipping, motion blur, unrealistic shadows, low detail, low resolution, compression artifacts, out of frame"
             "negative_prompt": None,
@@ -58,7 +288,5 @@ class ModelSlab(VideoGenerator):
             "resolution": 480,
             "sample_shift": 5,
             "portrait": True,
-            "webhook": None,
-            "track_id": None,
             "temp": True
-        })
\ No newline at end of file
+        }
\ No newline at end of file
@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import requests
+
+from generate.http_transport import HttpTransport
+from metrics.metrics import Metrics
+
+# --- Polling Configuration ---
+MIN_POLL_INTERVAL = 5 # seconds
+MAX_POLL_INTERVAL = 60 # seconds
+POLL_BACKOFF_FACTOR = 1.5 # Each 'processing' answer stretches the interval by this factor
+POLL_JITTER = 0.2 # +-20% so jobs submitted together don't poll together
+MIN_REQUEST_SPACING = 0.25 # seconds between two fetch requests, across all jobs
+JOB_TIMEOUT = 30 * 60 # seconds before a render is given up on
+# Polls are never retried in place, a failed one is just checked again on the job's next turn,
+# so one slow fetch can't hold up the deadlines and polls of every other job
+POLL_TIMEOUT = (5, 15) # (connect, read) seconds
+
+
+class _PollJob:
+    """A render being waited on: its latest response, deadline and current poll interval."""
+
+    def __init__(self, response : dict, future : Future, deadline : float):
+        self.response = response
+        self.future = future
+        self.deadline = deadline
+        self.tracked = time.monotonic()
+        self.polled = False
+        self.interval = _clamp(response.get("eta") or MIN_POLL_INTERVAL)
+
+
+def _clamp(interval : float) -> float:
+    return min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, interval))
+
+
+def _jitter(interval : float) -> float:
+    return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+
+class ModelSlabPoller:
+    """
+    Waits for any number of ModelSlab renders from a single background thread.
+    Outstanding jobs are kept in a heap ordered by their next check time, so the
+    thread only wakes up when the earliest job is due.
+    """
+
+    def __init__(self, transport : HttpTransport):
+        self._transport = transport
+        self._heap = []
+        self._sequence = itertools.count() # Tie-breaker so jobs are never compared
+        self._condition = threading.Condition()
+        self._thread = None
+        self._last_request = 0.0
+
+    def track(self, response : dict, timeout : float = JOB_TIMEOUT, first_check : float | None = None) -> Future:
+        """
+        Starts tracking a 'processing' response from ModelSlab.
+
+        Args:
+            response (dict): The response of the render request, containing 'fetch_result' and 'eta'.
+            timeout (float): Seconds after which the job fails with a TimeoutError.
+            first_check (float | None): Seconds before the first poll, defaults to the reported eta.
+                Used to hold polling back when a webhook is expected to complete the job first.
+        Returns:
+            Future: Resolves to the response with 'status' set to 'success' and 'output' filled in.
+        """
+        future = Future()
+        job = _PollJob(response, future, time.monotonic() + timeout)
+        with self._condition:
+            self._schedule(job, first_check)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="modelslab-poller", daemon=True)
+                self._thread.start()
+        return future
+
+    def resolve(self, future : Future, response : dict, result : dict) -> bool:
+        """
+        Applies a fetch or webhook result to a tracked job's Future.
+        Safe to call from any thread, the first final result wins.
+
+        Returns:
+            bool: True if the result is final ('success' or 'error').
+        """
+        try:
+            if result["status"] == "success":
+                response["status"] = "success"
+                response["output"] = result["output"]
+                future.set_result(response)
+            elif result["status"] == "error":
+                future.set_exception(RuntimeError(result))
+            else:
+                return False
+        except InvalidStateError:
+            pass # Already completed by the other channel
+        return True
+
+    def _schedule(self, job : _PollJob, delay : float | None = None) -> None:
+        """Pushes the job back on the heap. Must be called holding the condition."""
+        delay = _jitter(job.interval) if delay is None else delay
+        next_check = min(time.monotonic() + delay, job.deadline)
+        heapq.heappush(self._heap, (next_check, next(self._sequence), job))
+        self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        _, _, job = heapq.heappop(self._heap)
+                        break
+                    self._condition.wait(delay)
+            self._check(job)
+
+    def _check(self, job : _PollJob) -> None:
+        if job.future.done():
+            return # Completed or cancelled elsewhere
+        if time.monotonic() >= job.deadline:
+            try:
+                job.future.set_exception(TimeoutError(f"ModelSlab job {job.response.get('id')} did not finish in time"))
+            except InvalidStateError:
+                pass
+            return
+
+        if not job.polled:
+            job.polled = True
+            Metrics.record("render_first_poll", time.monotonic() - job.tracked, str(job.response.get("id")))
+        try:
+            with Metrics.span("render_poll", subject=str(job.response.get("id"))):
+                result = self._fetch(job.response["fetch_result"])
+        except (requests.RequestException, ValueError) as e:
+            print(f"Warning: Polling ModelSlab job {job.response.get('id')} failed, retrying: {e}")
+            result = {"status": "processing"}
+
+        if not self.resolve(job.future, job.response, result):
+            job.interval = _clamp(max(result.get("eta") or 0, job.interval * POLL_BACKOFF_FACTOR))
+            with self._condition:
+                self._schedule(job)
+
+    def _fetch(self, fetch_url : str) -> dict:
+        wait = self._last_request + MIN_REQUEST_SPACING - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+        response = self._transport.post(fetch_url, max_retries=0, timeout=POLL_TIMEOUT,
+                                        headers={'Content-Type': 'application/json'}, data=json.dumps({"key": os.getenv("MODELSLAB_KEY")}))
+        response.raise_for_status()
+        return json.loads(response.text)
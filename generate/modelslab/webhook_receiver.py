@@ -0,0 +1,98 @@
+import json
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        if not isinstance(payload, dict):
+            self.send_response(400)
+            self.end_headers()
+            return
+        self.server.receiver.complete(payload)
+        # Always acknowledge, an unknown track_id is not something ModelSlab can fix by retrying
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookReceiver:
+    """
+    Small local HTTP server receiving ModelSlab completion callbacks.
+    Each render is registered under its own track_id and its Future is
+    completed as soon as the matching callback arrives.
+    """
+
+    def __init__(self, host : str = "0.0.0.0", port : int = 8765):
+        self._address = (host, port)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self) -> None:
+        """Starts serving callbacks on a daemon thread. Does nothing if already started."""
+        with self._lock:
+            if self._server is not None:
+                return
+            self._server = ThreadingHTTPServer(self._address, _WebhookHandler)
+            self._server.receiver = self
+        threading.Thread(target=self._server.serve_forever, name="modelslab-webhook", daemon=True).start()
+        print(f"Debug: Listening for ModelSlab webhooks on port {self.get_port()}")
+
+    def stop(self) -> None:
+        with self._lock:
+            server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    def get_port(self) -> int:
+        """Returns the port actually bound, useful when started on port 0."""
+        return self._server.server_address[1]
+
+    def register(self, track_id : str) -> Future:
+        """
+        Registers a render before it is submitted.
+
+        Returns:
+            Future: Resolves to the callback payload with a final 'success' or 'error' status.
+        """
+        future = Future()
+        with self._lock:
+            self._pending[track_id] = future
+        return future
+
+    def forget(self, track_id : str) -> None:
+        """Drops a registration, e.g. when the render request itself failed."""
+        with self._lock:
+            self._pending.pop(track_id, None)
+
+    def complete(self, payload : dict) -> bool:
+        """
+        Completes the pending render matching the payload's track_id.
+        Intermediate 'processing' callbacks are ignored.
+
+        Returns:
+            bool: True if a pending render was completed.
+        """
+        track_id = str(payload.get("track_id"))
+        if payload.get("status") not in ("success", "error"):
+            return False
+        with self._lock:
+            future = self._pending.pop(track_id, None)
+        if future is None:
+            print(f"Warning: Received webhook for unknown track_id {track_id}")
+            return False
+        future.set_result(payload)
+        return True
@@ -0,0 +1,262 @@
+import os
+import struct
+from typing import BinaryIO, Iterator
+
+# --- MP4 Box Parsing ---
+# Only box headers are read while walking the file, sample data (mdat) is never touched.
+# The moov box is read whole, it only holds metadata and is small next to the media.
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"} # Boxes descended into inside moov
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+FASTSTART_SUFFIX = ".faststart"
+
+
+class Mp4Error(RuntimeError):
+    """Raised when a file is not a usable MP4."""
+
+
+class Mp4Info:
+    """
+    What Mp4.inspect() found in a file.
+    Provides getter methods for each field.
+    """
+    def __init__(self, duration: float, width: int, height: int, frame_count: int, faststart: bool):
+        self._duration = duration
+        self._width = width
+        self._height = height
+        self._frame_count = frame_count
+        self._faststart = faststart
+
+    def get_duration(self) -> float:
+        """Returns the duration in seconds."""
+        return self._duration
+
+    def get_width(self) -> int:
+        """Returns the width of the video track in pixels."""
+        return self._width
+
+    def get_height(self) -> int:
+        """Returns the height of the video track in pixels."""
+        return self._height
+
+    def get_frame_count(self) -> int:
+        """Returns the number of frames in the video track."""
+        return self._frame_count
+
+    def is_faststart(self) -> bool:
+        """Returns whether moov comes before mdat, so playback and processing can start before the whole file is read."""
+        return self._faststart
+
+    def __repr__(self):
+        """Provides a string representation for debugging."""
+        return (f"Mp4Info(duration={self._duration:.2f}s, resolution={self._width}x{self._height}, "
+                f"frames={self._frame_count}, faststart={self._faststart})")
+
+
+class Mp4:
+
+    def inspect(path : str) -> Mp4Info:
+        """
+        Checks that a file is a playable MP4 and reads its properties from the box headers.
+
+        Args:
+            path (str): The MP4 file.
+        Returns:
+            Mp4Info: Duration, resolution and frame count of the video.
+        Raises:
+            Mp4Error: If ftyp, moov or mdat is missing or malformed, or there is no video track.
+        """
+        with open(path, 'rb') as f:
+            boxes = Mp4._read_top_level_boxes(f, path)
+            moov = Mp4._read_moov(f, boxes, path)
+        return Mp4._parse_moov(moov, path, faststart=Mp4._moov_before_mdat(boxes))
+
+    def make_faststart(path : str) -> Mp4Info:
+        """
+        Validates a file and moves its moov box in front of the media data if it isn't already,
+        patching the chunk offsets. The file is rewritten in one streaming copy to a temporary
+        file that replaces the original, so it is never left half-written.
+
+        Args:
+            path (str): The MP4 file.
+        Returns:
+            Mp4Info: The properties of the (rewritten) file.
+        Raises:
+            Mp4Error: If the file is not a usable MP4.
+        """
+        with open(path, 'rb') as f:
+            boxes = Mp4._read_top_level_boxes(f, path)
+            moov = Mp4._read_moov(f, boxes, path)
+            info = Mp4._parse_moov(moov, path, faststart=Mp4._moov_before_mdat(boxes))
+            if info.is_faststart():
+                return info
+
+            moov_offset = next(offset for box_type, offset, _, _ in boxes if box_type == b"moov")
+            if any(box_type == b"mdat" and offset > moov_offset for box_type, offset, _, _ in boxes):
+                # Media after moov wouldn't move, so one offset shift doesn't fit every chunk
+                print(f"Warning: {path} has media data on both sides of moov, leaving it as is")
+                return info
+
+            moov = bytearray(moov)
+            if not Mp4._shift_chunk_offsets(moov, 0, len(moov), len(moov)):
+                print(f"Warning: Chunk offsets in {path} would overflow after moving moov, leaving it as is")
+                return info
+
+            first_mdat = next(offset for box_type, offset, _, _ in boxes if box_type == b"mdat")
+            temp_path = path + FASTSTART_SUFFIX
+            try:
+                with open(temp_path, 'wb') as out:
+                    moov_written = False
+                    for box_type, offset, _, size in boxes:
+                        if box_type == b"moov":
+                            continue
+                        if offset >= first_mdat and not moov_written:
+                            out.write(moov)
+                            moov_written = True
+                        f.seek(offset)
+                        Mp4._copy(f, out, size)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        os.replace(temp_path, path)
+        print(f"Debug: Moved moov to the front of {path}")
+        return Mp4._parse_moov(bytes(moov), path, faststart=True)
+
+    def check_header(data : bytes, source : str) -> None:
+        """
+        Checks that the first bytes of a file start with an ftyp box, for data that is streamed
+        and can't be inspected whole.
+
+        Raises:
+            Mp4Error: If the data doesn't start with an ftyp box.
+        """
+        if len(data) < 8 or data[4:8] != b"ftyp":
+            raise Mp4Error(f"{source} doesn't start with an ftyp box")
+
+    def _read_top_level_boxes(f : BinaryIO, path : str) -> list[tuple[bytes, int, int, int]]:
+        """Walks the top-level box headers. Returns (type, offset, header size, total size) tuples."""
+        file_size = os.fstat(f.fileno()).st_size
+        boxes = list(Mp4._iter_boxes(f, 0, file_size, path))
+        types = [box[0] for box in boxes]
+        if not types or types[0] != b"ftyp":
+            raise Mp4Error(f"{path} doesn't start with an ftyp box")
+        for required in (b"moov", b"mdat"):
+            if required not in types:
+                raise Mp4Error(f"{path} has no {required.decode()} box")
+        return boxes
+
+    def _iter_boxes(f : BinaryIO, start : int, end : int, path : str) -> Iterator[tuple[bytes, int, int, int]]:
+        offset = start
+        while offset < end:
+            f.seek(offset)
+            header = f.read(8)
+            if len(header) < 8:
+                raise Mp4Error(f"{path} is truncated at byte {offset}")
+            size, box_type = struct.unpack(">I4s", header)
+            header_size = 8
+            if size == 1:
+                large = f.read(8)
+                if len(large) < 8:
+                    raise Mp4Error(f"{path} is truncated at byte {offset}")
+                size = struct.unpack(">Q", large)[0]
+                header_size = 16
+            elif size == 0: # Extends to the end of the file
+                size = end - offset
+            if size < header_size or offset + size > end:
+                raise Mp4Error(f"{path} has a malformed {box_type!r} box at byte {offset}")
+            yield box_type, offset, header_size, size
+            offset += size
+
+    def _read_moov(f : BinaryIO, boxes : list[tuple[bytes, int, int, int]], path : str) -> bytes:
+        _, offset, _, size = next(box for box in boxes if box[0] == b"moov")
+        if size > MAX_MOOV_SIZE:
+            raise Mp4Error(f"{path} has an implausibly large moov box ({size} bytes)")
+        f.seek(offset)
+        return f.read(size)
+
+    def _moov_before_mdat(boxes : list[tuple[bytes, int, int, int]]) -> bool:
+        types = [box[0] for box in boxes]
+        return types.index(b"moov") < types.index(b"mdat")
+
+    def _children(data : bytes | bytearray, start : int, end : int) -> Iterator[tuple[bytes, int, int]]:
+        """Yields (type, payload start, box end) of the boxes in data[start:end]."""
+        offset = start
+        while offset + 8 <= end:
+            size, box_type = struct.unpack_from(">I4s", data, offset)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack_from(">Q", data, offset + 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = end - offset
+            if size < header_size or offset + size > end:
+                raise Mp4Error(f"Malformed {box_type!r} box inside moov")
+            yield box_type, offset + header_size, offset + size
+            offset += size
+
+    def _find(data : bytes | bytearray, start : int, end : int, box_type : bytes) -> tuple[int, int] | None:
+        """Returns the (payload start, end) of the first direct child of the given type."""
+        for child_type, payload, child_end in Mp4._children(data, start, end):
+            if child_type == box_type:
+                return payload, child_end
+        return None
+
+    def _parse_moov(moov : bytes, path : str, faststart : bool) -> Mp4Info:
+        _, moov_payload, moov_end = next(Mp4._children(moov, 0, len(moov)))
+        try:
+            mvhd = Mp4._find(moov, moov_payload, moov_end, b"mvhd")
+            if mvhd is None:
+                raise Mp4Error(f"{path} has no mvhd box")
+            version = moov[mvhd[0]]
+            if version == 1:
+                timescale, duration = struct.unpack_from(">IQ", moov, mvhd[0] + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", moov, mvhd[0] + 12)
+            if timescale == 0:
+                raise Mp4Error(f"{path} has a zero timescale")
+
+            for child_type, trak_payload, trak_end in Mp4._children(moov, moov_payload, moov_end):
+                if child_type != b"trak":
+                    continue
+                mdia = Mp4._find(moov, trak_payload, trak_end, b"mdia")
+                hdlr = mdia and Mp4._find(moov, *mdia, b"hdlr")
+                if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+                    continue
+                tkhd = Mp4._find(moov, trak_payload, trak_end, b"tkhd")
+                minf = Mp4._find(moov, *mdia, b"minf")
+                stbl = minf and Mp4._find(moov, *minf, b"stbl")
+                stsz = stbl and Mp4._find(moov, *stbl, b"stsz")
+                if not tkhd or not stsz:
+                    raise Mp4Error(f"{path} has an incomplete video track")
+                # Width and height are the last two 16.16 fixed-point fields of tkhd
+                width, height = struct.unpack_from(">II", moov, tkhd[1] - 8)
+                frame_count = struct.unpack_from(">I", moov, stsz[0] + 8)[0]
+                if frame_count == 0:
+                    raise Mp4Error(f"{path} has no video frames")
+                return Mp4Info(duration / timescale, width >> 16, height >> 16, frame_count, faststart)
+        except struct.error as e:
+            raise Mp4Error(f"{path} has a truncated box inside moov: {e}") from e
+        raise Mp4Error(f"{path} has no video track")
+
+    def _shift_chunk_offsets(moov : bytearray, start : int, end : int, delta : int) -> bool:
+        """Adds `delta` to every stco/co64 entry below data[start:end]. Returns False if a 32-bit offset would overflow."""
+        for box_type, payload, box_end in Mp4._children(moov, start, end):
+            if box_type in CONTAINER_BOXES:
+                if not Mp4._shift_chunk_offsets(moov, payload, box_end, delta):
+                    return False
+            elif box_type in (b"stco", b"co64"):
+                entry_format = "I" if box_type == b"stco" else "Q"
+                count = struct.unpack_from(">I", moov, payload + 4)[0]
+                offsets = struct.unpack_from(f">{count}{entry_format}", moov, payload + 8)
+                if box_type == b"stco" and offsets and max(offsets) + delta > 0xFFFFFFFF:
+                    return False
+                struct.pack_into(f">{count}{entry_format}", moov, payload + 8, *(offset + delta for offset in offsets))
+        return True
+
+    def _copy(source : BinaryIO, destination : BinaryIO, length : int) -> None:
+        while length > 0:
+            chunk = source.read(min(COPY_CHUNK_SIZE, length))
+            if not chunk:
+                raise Mp4Error("File ended while copying")
+            destination.write(chunk)
+            length -= len(chunk)
@@ -1,7 +1,40 @@
+from concurrent.futures import Future
+from typing import Callable, Iterator
+
+
 class VideoGenerator:
+    """
+    Interface of a video provider. Providers are used as classes, e.g. ModelSlab.submit(prompt),
+    and are registered with the GeneratorRegistry, which picks one for every render.
+    """
+
+    ASYNC_SUBMIT = False # Whether the provider implements submit(), otherwise generate() runs on a worker thread
 
     def generate(prompt : str) -> str:
+        """
+        Renders a clip into the clip folder, blocking until it is there.
+
+        Returns:
+            str: The file name of the clip.
+        """
+        pass
+
+    def submit(prompt : str, stream_to : Callable[[str, Iterator[bytes]], bool] | None = None) -> Future:
+        """
+        Starts a render without waiting for it. Providers that can track renders without holding
+        a thread implement this and set ASYNC_SUBMIT.
+
+        Returns:
+            Future: Resolves to the file name of the clip, or None if it was consumed by `stream_to`.
+        """
+        pass
+
+    def discard(file_name : str) -> None:
+        """
+        Called with a clip that finished after another provider's clip was used for the same render,
+        so the provider can close whatever it keeps about it. The clip is not logged.
+        """
         pass
 
     def get_clip_folder() -> str:
-        return "generate/clips/"
\ No newline at end of file
+        return "generate/clips/"
@@ -1,10 +1,36 @@
+import sys
 from dotenv import load_dotenv
 load_dotenv(override=True)
 from database.database import Database
+from generate.generator_registry import GeneratorRegistry
+from generate.modelslab.modelslab import ModelSlab
 from uploaders.youtube_uploader import YoutubeUploader
+from pipelines.daemon import Daemon
 from pipelines.pipeline import Pipeline
+from pipelines.review_manifest import REVIEW_MANIFEST_PATH, ReviewManifest
+from metrics.metrics import Metrics
 
+# python main.py          one interactive run
+# python main.py daemon   keep generating, screening and uploading until stopped
+# python main.py review   review pending clips one by one, e.g. next to a running daemon
+# python main.py review export   list pending clips in the review manifest to decide in bulk
+# python main.py review apply    apply the decisions saved in the review manifest
+mode = sys.argv[1] if len(sys.argv) > 1 else "run"
 
 #YoutubeUploader._get_authenticated_service()
-Pipeline.run()
-#Database.view_all_logs()
\ No newline at end of file
+# Spans go to the metrics table, set METRICS_FILE or METRICS_PORT for a Prometheus export
+Metrics.start()
+# Providers in order of preference, renders fail over down the list
+GeneratorRegistry.register(ModelSlab, max_in_flight=Pipeline.GENERATION_MAX_IN_FLIGHT)
+if mode == "daemon":
+    Daemon.run()
+elif mode == "review" and sys.argv[2:3] == ["export"]:
+    Pipeline.screen_reviews()
+    print(f"{ReviewManifest.export()} clips to review in {REVIEW_MANIFEST_PATH}")
+elif mode == "review" and sys.argv[2:3] == ["apply"]:
+    print(f"Applied {ReviewManifest.apply()} review decisions")
+elif mode == "review":
+    Pipeline.review()
+else:
+    Pipeline.run()
+#Database.view_all_logs()
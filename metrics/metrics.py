@@ -0,0 +1,222 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+from database.timestamps import now_epoch
+
+# --- Metrics Configuration ---
+# Spans are aggregated in memory for the Prometheus export and buffered for the metrics table,
+# which a background thread writes in batches, so recording one costs a lock and an append.
+METRIC_PREFIX = "moneymaker"
+FLUSH_INTERVAL = 10 # seconds
+MAX_BUFFERED_SPANS = 10000 # The oldest unwritten spans are dropped past this
+RETENTION = timedelta(days=30)
+PRUNE_INTERVAL = 60 * 60 # seconds
+# Upper bounds in seconds, from database calls up to clips waiting days for review
+DURATION_BUCKETS = (0.005, 0.025, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 1800, 3600, 6 * 3600, 24 * 3600, 7 * 24 * 3600)
+METRICS_FILE = os.getenv("METRICS_FILE") # Rewritten on every flush, e.g. for node_exporter's textfile collector
+METRICS_PORT = os.getenv("METRICS_PORT") # Serves http://127.0.0.1:<port>/metrics when set
+
+_lock = threading.Lock()
+_durations = {} # stage -> [count per bucket, sum, count]
+_outcomes = {} # (stage, 'ok' | 'error') -> count
+_bytes = {} # stage -> [bytes, seconds spent moving them]
+_counters = {} # name -> value
+_pending = deque(maxlen=MAX_BUFFERED_SPANS)
+_local = threading.local()
+_flusher = None
+_server = None
+_last_prune = 0.0
+
+
+class Span:
+    """A stage being timed by Metrics.span(), the code inside can add what it moved."""
+    def __init__(self, stage : str, subject : str | None):
+        self.stage = stage
+        self.subject = subject
+        self.byte_count = None
+        self.ok = True
+
+    def set_bytes(self, byte_count : int) -> None:
+        self.byte_count = byte_count
+
+    def set_failed(self) -> None:
+        """Marks the stage as failed when it reports failure without raising."""
+        self.ok = False
+
+
+class Metrics:
+    """
+    Per-stage timing and throughput. Every span lands in the metrics table for later analysis
+    and in counters and histograms exported in the Prometheus text format, to a file and/or a
+    local endpoint, so it's visible which stage limits throughput.
+    """
+
+    def start() -> None:
+        """Starts the background flush and, if METRICS_PORT is set, the metrics endpoint. Safe to call twice."""
+        global _flusher, _server
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=Metrics._flush_loop, name="metrics-flush", daemon=True)
+                _flusher.start()
+                atexit.register(Metrics.flush)
+            if METRICS_PORT and _server is None:
+                _server = ThreadingHTTPServer(("127.0.0.1", int(METRICS_PORT)), _MetricsHandler)
+                threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+                print(f"Debug: Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+
+    @contextmanager
+    def span(stage : str, subject : str | None = None) -> Iterator[Span]:
+        """
+        Times the enclosed block as one span of `stage`. It counts as failed if it raises.
+
+        Args:
+            stage (str): The pipeline stage, e.g. 'download'.
+            subject (str | None): What the span is about, e.g. the file name.
+        """
+        span = Span(stage, subject)
+        started = now_epoch()
+        start = time.monotonic()
+        try:
+            yield span
+        except BaseException:
+            span.set_failed()
+            raise
+        finally:
+            Metrics.record(stage, time.monotonic() - start, span.subject, span.byte_count, span.ok, started)
+
+    def record(stage : str, duration : float, subject : str | None = None, byte_count : int | None = None,
+               ok : bool = True, started : int | None = None) -> None:
+        """
+        Records a span that was timed elsewhere.
+
+        Args:
+            stage (str): The pipeline stage.
+            duration (float): Seconds the stage took.
+            subject (str | None): What the span is about.
+            byte_count (int | None): Bytes moved, for throughput.
+            ok (bool): Whether the stage succeeded.
+            started (int | None): UTC epoch seconds when it started, derived from `duration` if omitted.
+        """
+        if getattr(_local, "flushing", False):
+            return # Writing the spans would otherwise time itself
+        if started is None:
+            started = now_epoch() - int(duration)
+        with _lock:
+            histogram = _durations.setdefault(stage, [[0] * len(DURATION_BUCKETS), 0.0, 0])
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += duration
+            histogram[2] += 1
+            outcome = (stage, "ok" if ok else "error")
+            _outcomes[outcome] = _outcomes.get(outcome, 0) + 1
+            if byte_count is not None:
+                moved = _bytes.setdefault(stage, [0, 0.0])
+                moved[0] += byte_count
+                moved[1] += duration
+            _pending.append((stage, subject, started, duration, byte_count, ok))
+
+    def increment(name : str, amount : int = 1) -> None:
+        """Adds to a counter, exported as <prefix>_<name>_total."""
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+    def render() -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with _lock:
+            lines = [
+                f"# HELP {METRIC_PREFIX}_stage_duration_seconds Time spent per span of each pipeline stage.",
+                f"# TYPE {METRIC_PREFIX}_stage_duration_seconds histogram",
+            ]
+            for stage, (buckets, total, count) in sorted(_durations.items()):
+                for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+                lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+                lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+            lines.append(f"# HELP {METRIC_PREFIX}_stage_total Spans per pipeline stage by outcome.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_total counter")
+            for (stage, outcome), count in sorted(_outcomes.items()):
+                lines.append(f'{METRIC_PREFIX}_stage_total{{stage="{stage}",outcome="{outcome}"}} {count}')
+
+            lines.append(f"# HELP {METRIC_PREFIX}_stage_bytes_total Bytes moved per pipeline stage.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_bytes_total counter")
+            for stage, (byte_count, _) in sorted(_bytes.items()):
+                lines.append(f'{METRIC_PREFIX}_stage_bytes_total{{stage="{stage}"}} {byte_count}')
+            lines.append(f"# HELP {METRIC_PREFIX}_stage_throughput_bytes_per_second Bytes per second while a stage was moving data.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_throughput_bytes_per_second gauge")
+            for stage, (byte_count, seconds) in sorted(_bytes.items()):
+                throughput = byte_count / seconds if seconds > 0 else 0.0
+                lines.append(f'{METRIC_PREFIX}_stage_throughput_bytes_per_second{{stage="{stage}"}} {throughput}')
+
+            for name, value in sorted(_counters.items()):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+                lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def flush() -> None:
+        """Writes the buffered spans to the metrics table and, if METRICS_FILE is set, the export file."""
+        # Imported here, the database records its own latency through this module
+        from database.database import Database
+
+        global _last_prune
+        with _lock:
+            spans = list(_pending)
+            _pending.clear()
+        _local.flushing = True
+        try:
+            if spans and not Database.log_metric_spans(spans):
+                with _lock:
+                    # Kept for the next flush, in order, so past the limit the oldest spans are dropped
+                    newer = list(_pending)
+                    _pending.clear()
+                    _pending.extend(spans)
+                    _pending.extend(newer)
+            if time.monotonic() - _last_prune >= PRUNE_INTERVAL:
+                _last_prune = time.monotonic()
+                Database.delete_metric_spans_before(datetime.now(timezone.utc) - RETENTION)
+        finally:
+            _local.flushing = False
+        if METRICS_FILE:
+            Metrics._write_file(METRICS_FILE)
+
+    def _flush_loop() -> None:
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                Metrics.flush()
+            except Exception as e:
+                print(f"Error flushing metrics: {e}")
+
+    def _write_file(path : str) -> None:
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(Metrics.render())
+        # Scrapers never see a half-written file
+        os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = Metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes would flood the output
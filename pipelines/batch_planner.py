@@ -0,0 +1,59 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from database.database import Database
+from database.file_log_entry import ReviewStatus
+from database.generation_job import GenerationJobStatus
+
+# --- Planning Configuration ---
+HISTORY_WINDOW = timedelta(days=30) # Only recent history, rates drift as prompts and models change
+# Rates start from these priors, weighted like PRIOR_WEIGHT observations, so a short history can't swing the plan
+PRIOR_REJECTION_RATE = 0.2
+PRIOR_FAILURE_RATE = 0.1
+PRIOR_WEIGHT = 10
+MIN_YIELD = 0.2 # Plans never assume fewer than 1 in 5 renders make it into the queue
+MAX_BATCH_SIZE = 60
+
+
+class BatchPlanner:
+    """
+    Works out how many renders to submit to refill the upload queue, instead of a fixed batch.
+    Each render only reaches the queue if it doesn't fail and isn't rejected in review,
+    so the deficit is divided by the expected yield from recent history.
+    """
+
+    def plan(deficit : int, reviewed : bool = True) -> int:
+        """
+        Args:
+            deficit (int): Clips missing from the queue.
+            reviewed (bool): Whether the clips go through review, False for auto-approved clips.
+        Returns:
+            int: Renders to submit, 0 if the queue is full.
+        """
+        if deficit <= 0:
+            return 0
+        since = datetime.now(timezone.utc) - HISTORY_WINDOW
+        failure_rate = BatchPlanner.get_failure_rate(since)
+        rejection_rate = BatchPlanner.get_rejection_rate(since) if reviewed else 0.0
+        expected_yield = max(MIN_YIELD, (1 - failure_rate) * (1 - rejection_rate))
+        count = min(MAX_BATCH_SIZE, math.ceil(deficit / expected_yield))
+        print(f"Planning {count} renders for {deficit} missing clips "
+              f"(failure rate {failure_rate:.0%}, rejection rate {rejection_rate:.0%})")
+        return count
+
+    def get_rejection_rate(since : datetime) -> float:
+        """Share of reviewed clips created since `since` that were denied."""
+        counts = Database.get_review_status_counts(since)
+        denied = counts.get(ReviewStatus.DENIED, 0)
+        reviewed = denied + counts.get(ReviewStatus.ACCEPTED, 0)
+        return BatchPlanner._smoothed_rate(denied, reviewed, PRIOR_REJECTION_RATE)
+
+    def get_failure_rate(since : datetime) -> float:
+        """Share of finished renders submitted since `since` that failed."""
+        counts = Database.get_generation_job_status_counts(since)
+        failed = counts.get(GenerationJobStatus.FAILED, 0)
+        finished = failed + counts.get(GenerationJobStatus.COMPLETED, 0)
+        return BatchPlanner._smoothed_rate(failed, finished, PRIOR_FAILURE_RATE)
+
+    def _smoothed_rate(hits : int, total : int, prior : float) -> float:
+        return (hits + prior * PRIOR_WEIGHT) / (total + PRIOR_WEIGHT)
@@ -0,0 +1,95 @@
+import os
+import signal
+import threading
+from typing import Callable
+
+from dotenv import load_dotenv
+from database.database import Database
+from pipelines.batch_planner import BatchPlanner
+from pipelines.pipeline import Pipeline
+from pipelines.review_manifest import ReviewManifest
+
+# --- Daemon Configuration ---
+# Seconds each worker sleeps between passes. The stages only talk through the database:
+# generation fills file_logs, review intake moves clips from Pending to Accepted/Denied
+# and upload drains the approved ones.
+GENERATION_INTERVAL = 300
+REVIEW_INTERVAL = 60
+UPLOAD_INTERVAL = 600
+
+_stop = threading.Event()
+
+
+class Daemon:
+
+    def run() -> None:
+        """
+        Runs generation, review intake and upload as independent workers until SIGINT or SIGTERM.
+        Each worker finishes its current pass before exiting, renders still in flight are
+        waited for, and anything interrupted is picked up again by the journal on the next start.
+        Set AUTO_APPROVE=1 to approve playable clips without a human. Otherwise pending clips
+        are listed in the review manifest, decisions saved there are applied on the next
+        review pass.
+        """
+        load_dotenv(override=True)
+        _stop.clear()
+        signal.signal(signal.SIGINT, lambda signum, frame: Daemon.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: Daemon.stop())
+
+        workers = [
+            threading.Thread(target=Daemon._generation_work, name="daemon-generation"),
+            threading.Thread(target=Daemon._work, args=("review", Daemon._review_pass, REVIEW_INTERVAL), name="daemon-review"),
+            threading.Thread(target=Daemon._work, args=("upload", Daemon._upload_pass, UPLOAD_INTERVAL), name="daemon-upload"),
+        ]
+        for worker in workers:
+            worker.start()
+        print("Daemon running, press Ctrl+C to stop")
+        # join() with a timeout, so the main thread keeps handling signals
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(timeout=1)
+        print("Daemon stopped")
+
+    def stop() -> None:
+        """Asks every worker to stop after its current pass."""
+        if not _stop.is_set():
+            print("Stopping daemon, waiting for the workers to finish their current pass...")
+        _stop.set()
+
+    def _work(name : str, work_pass : Callable[[], None], interval : float) -> None:
+        while not _stop.is_set():
+            try:
+                work_pass()
+            except Exception as e:
+                print(f"Error in the {name} worker: {e}")
+            _stop.wait(interval)
+        Database.close_db_connection()
+
+    def _generation_work() -> None:
+        # Resumed on the worker, not before the workers start, so a stop signal is handled meanwhile
+        try:
+            Pipeline.resume_generation_jobs(stop=_stop)
+        except Exception as e:
+            print(f"Error resuming generation jobs: {e}")
+        Daemon._work("generation", Daemon._generation_pass, GENERATION_INTERVAL)
+
+    def _generation_pass() -> None:
+        # Backpressure: only render what the channel queue is missing, scaled up for expected losses
+        missing = Pipeline.QUEUE_SIZE - Database.count_future_youtube_uploads()
+        if missing <= 0:
+            return
+        auto_approved = Pipeline.DIRECT_UPLOAD or Daemon._auto_approve()
+        count = BatchPlanner.plan(missing, reviewed=not auto_approved)
+        print(f"Queue is {missing} clips short, generating {count}")
+        Pipeline.generate(count, direct_upload=Pipeline.DIRECT_UPLOAD, stop=_stop)
+
+    def _review_pass() -> None:
+        Pipeline.screen_reviews(auto_approve=Daemon._auto_approve())
+        if not Daemon._auto_approve():
+            ReviewManifest.sync()
+
+    def _upload_pass() -> None:
+        Pipeline.upload_youtube()
+
+    def _auto_approve() -> bool:
+        return os.getenv("AUTO_APPROVE") == "1"
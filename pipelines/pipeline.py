@@ -1,88 +1,339 @@
+import sqlite3
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Iterable, Iterator
 from dotenv import load_dotenv
 from database.database import Database
-from database.file_log_entry import ReviewStatus
+from database.file_log_entry import FileLogEntry, ReviewStatus
+from generate.generator_registry import GeneratorRegistry
 from generate.modelslab.modelslab import ModelSlab
+from generate.mp4 import Mp4, Mp4Error
 from generate.video_generator import VideoGenerator
+from metrics.metrics import Metrics
+from pipelines.batch_planner import BatchPlanner
 from prompt.prompt_generator import PromptGenerator
+from prompt.prompt_sampler import PromptSpaceExhaustedError
+from uploaders.youtube_quota import VIDEOS_INSERT_COST, QuotaExhaustedError, YoutubeQuota
 from uploaders.youtube_uploader import YoutubeUploader
 
 
 class Pipeline:
 
-    GENERATION_BATCH_SIZE = 10
+    GENERATION_MAX_IN_FLIGHT = 5 # Max number of renders running at the same time
     QUEUE_SIZE = 30
     UPLOAD_COOLDOWN = 24 #h
+    UPLOAD_MAX_WORKERS = 3 # Max number of videos uploading at the same time
+    DIRECT_UPLOAD = False # Stream generated clips straight to YouTube, skipping disk and review
+    STREAM_LEASE = timedelta(hours=1) # How long upload_youtube() leaves a clip being streamed alone
+    STOP_CHECK_INTERVAL = 1 # s, how often a wait for resumed renders checks whether to stop
 
     def review() -> None:
-        pending_reviews = Database.get_pending_review_entries()
-        while len(pending_reviews) > 0:
-            rev = pending_reviews.pop()
-            print(rev.get_description())
-            print(rev.get_filename())
-            approved = None
-            while approved is None:
-                approve_str = input("Approve (Y/N)?")
-                if approve_str == "Y":
-                    approved = True
-                elif approve_str == "N":
-                    approved = False
-            Database.mark_reviewed(rev.get_id(), ReviewStatus.ACCEPTED if approved else ReviewStatus.DENIED)
-
-    def upload_youtube() -> None:
-        pending_entries = Database.get_approved_but_not_youtube_uploaded_entries()
-        if not pending_entries:
+        decisions = []
+        try:
+            for rev in Database.get_pending_review_entries():
+                if not Pipeline._is_playable(rev):
+                    decisions.append((rev.get_id(), ReviewStatus.DENIED))
+                    continue
+                print(rev.get_description())
+                print(rev.get_filename())
+                approved = None
+                while approved is None:
+                    approve_str = input("Approve (Y/N)?")
+                    if approve_str == "Y":
+                        approved = True
+                    elif approve_str == "N":
+                        approved = False
+                decisions.append((rev.get_id(), ReviewStatus.ACCEPTED if approved else ReviewStatus.DENIED))
+                Pipeline._record_review_wait(rev)
+        finally:
+            # All decisions are stored in one commit, including those made before an interrupt
+            Database.mark_reviewed_batch(decisions)
+
+    def screen_reviews(auto_approve : bool = False) -> None:
+        """
+        Unattended review intake: denies pending clips that aren't playable, and approves
+        the others if `auto_approve`. Without it, playable clips are left for review().
+        """
+        decisions = []
+        for rev in Database.get_pending_review_entries():
+            if not Pipeline._is_playable(rev):
+                decisions.append((rev.get_id(), ReviewStatus.DENIED))
+            elif auto_approve:
+                decisions.append((rev.get_id(), ReviewStatus.ACCEPTED))
+                Pipeline._record_review_wait(rev)
+        Database.mark_reviewed_batch(decisions)
+
+    def _record_review_wait(entry : FileLogEntry) -> None:
+        """Records how long a clip waited between being logged and being reviewed."""
+        waited = datetime.now(timezone.utc) - entry.get_creation_timestamp()
+        Metrics.record("review_wait", waited.total_seconds(), str(entry.get_id()))
+
+    def _is_playable(entry : FileLogEntry) -> bool:
+        try:
+            Mp4.inspect(VideoGenerator.get_clip_folder() + entry.get_filename())
+            return True
+        except (Mp4Error, OSError) as e:
+            print(f"Denying {entry.get_id()}, the clip is not playable: {e}")
+            return False
+
+    def upload_youtube(max_workers : int = UPLOAD_MAX_WORKERS) -> None:
+        """
+        Uploads every approved clip with at most `max_workers` uploads running concurrently.
+        Each upload claims the earliest free publish slot in the database when it starts and
+        releases it if it fails, so other uploaders (e.g. direct streams) see every slot in use.
+        Uploads interrupted in an earlier run are resumed with the slot they were started with.
+        Uploads that don't fit in today's API quota are left for a later run.
+        Uploads that failed too often are no longer retried, they are listed on every run instead.
+        """
+        for upload in Database.get_dead_lettered_youtube_uploads():
+            print(f"Warning: Upload of log ID {upload.get_log_id()} gave up after {upload.get_attempts()} attempts: {upload.get_last_error()}")
+        entries = list(Database.get_approved_but_not_youtube_uploaded_entries())
+        if not entries:
             return
-        current_timestamp = datetime.now(timezone.utc)
-        latest_timestamp = Database.get_latest_youtube_upload_timestamp() 
-        if latest_timestamp and latest_timestamp.tzinfo is None:
-            latest_timestamp = latest_timestamp.astimezone(timezone.utc)
-        next_upload_slot = None
-        if latest_timestamp is None: # FIRST EVER UPLOAD
-            next_upload_slot = current_timestamp + timedelta(hours=6)
+        remaining_quota = YoutubeQuota.remaining()
+        print(f"{len(entries)} uploads waiting, today's YouTube quota covers {remaining_quota // VIDEOS_INSERT_COST} new ones "
+              f"({remaining_quota} units left until {YoutubeQuota.next_window_start().isoformat()})")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(Pipeline._upload_entry, entry) for entry in entries]:
+                future.result()
+
+    def _upload_entry(entry : FileLogEntry) -> None:
+        upload = Database.get_youtube_upload(entry.get_id())
+        resumed_slot = upload.get_publish_at() if upload is not None else None
+        if resumed_slot is not None:
+            # Reserved earlier, or sent when the session was created and can't change anymore
+            scheduled_upload_time = resumed_slot
         else:
-            earliest_allowed_time = latest_timestamp + timedelta(hours=Pipeline.UPLOAD_COOLDOWN)
-
-            if current_timestamp < earliest_allowed_time:
-                next_upload_slot = earliest_allowed_time
-            else:
-                next_upload_slot = current_timestamp + timedelta(minutes=1)
-                
-        current_scheduled_upload_time = next_upload_slot
-
-        for entry in pending_entries:
-            current_timestamp = datetime.now(timezone.utc)
-            if current_scheduled_upload_time < current_timestamp:
-                print(f"Warning: Calculated upload time for {entry.get_id()} ({current_scheduled_upload_time}) is in the past. Adjusting to now + 1 minute.")
-                current_scheduled_upload_time = current_timestamp + timedelta(minutes=1)
-
-            print(f"Attempting to upload video '{entry.get_description()}' (ID: {entry.get_id()}) scheduled for {current_scheduled_upload_time.isoformat()}")
-
-            if YoutubeUploader.upload_video(
-                entry.get_description(), 
-                entry.get_description(), 
-                VideoGenerator.get_clip_folder() + entry.get_filename(), 
-                current_scheduled_upload_time
-            ):
-                Database.mark_youtube_uploaded(entry.get_id(), current_scheduled_upload_time)
-                print(f"Successfully uploaded and marked entry {entry.get_id()}")
-            else:
+            try:
+                scheduled_upload_time = Pipeline._claim_upload_slot(entry.get_id())
+            except sqlite3.Error as e:
+                print(f"Error reserving a publish slot for {entry.get_id()}, leaving it for the next run: {e}")
+                return
+        rescheduled = []
+
+        def reschedule() -> datetime:
+            # Only called when the stored session can't be resumed and its slot has passed
+            rescheduled.append(Pipeline._claim_upload_slot(entry.get_id()))
+            return rescheduled[-1]
+
+        print(f"Attempting to upload video '{entry.get_description()}' (ID: {entry.get_id()}) scheduled for {scheduled_upload_time.isoformat()}")
+
+        uploaded = False
+        deferred = False
+        try:
+            uploaded = YoutubeUploader.upload_video(
+                entry.get_description(),
+                entry.get_description(),
+                VideoGenerator.get_clip_folder() + entry.get_filename(),
+                scheduled_upload_time,
+                log_id=entry.get_id(),
+                reschedule=reschedule
+            )
+        except QuotaExhaustedError as e:
+            deferred = True
+            print(f"Deferred upload of {entry.get_id()} to the next run: {e}")
+        except Exception as e:
+            print(f"Error uploading {entry.get_id()}: {e}")
+
+        if rescheduled:
+            scheduled_upload_time = rescheduled[-1]
+        if uploaded:
+            Database.mark_youtube_uploaded(entry.get_id(), scheduled_upload_time)
+            print(f"Successfully uploaded and marked entry {entry.get_id()}")
+        else:
+            if not deferred:
                 print(f"Failed to upload {entry.get_id()}")
-            
-            current_scheduled_upload_time += timedelta(hours=Pipeline.UPLOAD_COOLDOWN)
+            # Unless a session was started with it, the slot goes to the next upload, so no gap is left
+            Database.release_youtube_upload_slot(entry.get_id())
+
+    def _claim_upload_slot(log_id : int, lease_until : datetime | None = None) -> datetime:
+        """
+        Reserves the earliest free publish slot for a log entry and returns it. The slot is worked
+        out under the database write lock, so two uploaders can never claim the same one.
+
+        Raises:
+            sqlite3.Error: If the reservation can't be stored.
+        """
+        with Database.transaction():
+            slot = Pipeline._allocate_upload_slots(1)[0]
+            Database.reserve_youtube_upload_slot(log_id, slot, lease_until)
+        return slot
+
+    def _allocate_upload_slots(count : int, reserved : Iterable[datetime] = ()) -> list[datetime]:
+        """
+        Works out `count` publish slots, earliest first, at least UPLOAD_COOLDOWN apart from
+        each other, from every upload already scheduled and from the `reserved` times. Gaps in the
+        schedule, such as one left by an upload that failed, are filled before slots are added
+        after the latest upload.
+        """
+        cooldown = timedelta(hours=Pipeline.UPLOAD_COOLDOWN)
+        current_timestamp = datetime.now(timezone.utc)
+        if Database.get_latest_youtube_upload_timestamp() is None: # FIRST EVER UPLOAD
+            candidate = current_timestamp + timedelta(hours=6)
+        else:
+            candidate = current_timestamp + timedelta(minutes=1)
+        # Anything within one cooldown before the first candidate still blocks it, reservations included
+        scheduled = Database.get_youtube_upload_timestamps(candidate - cooldown)
+        scheduled = sorted([*scheduled, *reserved])
+
+        slots = []
+        for taken in scheduled:
+            while len(slots) < count and candidate + cooldown <= taken:
+                slots.append(candidate)
+                candidate += cooldown
+            if len(slots) == count:
+                break
+            candidate = max(candidate, taken + cooldown)
+        while len(slots) < count:
+            slots.append(candidate)
+            candidate += cooldown
+        return slots
+
+    def generate(count : int, max_in_flight : int = GENERATION_MAX_IN_FLIGHT, direct_upload : bool = False,
+                 stop : threading.Event | None = None) -> None:
+        """
+        Generates `count` clips with at most `max_in_flight` renders running concurrently.
+        Each clip is logged to the database as soon as its render finishes.
+
+        With `direct_upload` the clips are auto-approved: each one is streamed from the provider
+        straight into a YouTube upload without touching the disk. A clip whose stream upload
+        fails is downloaded instead and left approved, for upload_youtube() to retry.
+
+        Once `stop` is set no more renders are submitted, those in flight are still finished.
+        """
+        in_flight = {}
+        submitted = 0
+        stream_to = None
+        while submitted < count or in_flight:
+            if stop is not None and stop.is_set():
+                count = submitted
+            while submitted < count and len(in_flight) < max_in_flight:
+                try:
+                    prompt = PromptGenerator.generate()
+                except PromptSpaceExhaustedError as e:
+                    print(f"Stopping generation after {submitted} clips: {e}")
+                    count = submitted
+                    break
+                submitted += 1
+                if direct_upload:
+                    stream_to = partial(Pipeline._upload_streamed_clip, prompt)
+                try:
+                    in_flight[GeneratorRegistry.submit(prompt, stream_to)] = prompt
+                except Exception as e:
+                    print(f"Failed to submit render for '{prompt}': {e}")
+            if in_flight:
+                Pipeline._log_finished_clips(in_flight, approve=direct_upload)
+
+    def _upload_streamed_clip(prompt : str, file_name : str, chunks : Iterator[bytes]) -> bool:
+        """
+        Uploads a clip as it is downloaded. Returns whether it was uploaded.
+
+        The clip is logged as approved and its publish slot reserved before the stream starts, leased
+        for STREAM_LEASE so upload_youtube() leaves it alone meanwhile. The created video is recorded
+        against the log entry, so a crash before the upload is marked can't lead to a second upload:
+        the journal downloads the clip again and upload_youtube() finds the video already exists.
+        If the stream fails the clip is downloaded instead and the entry retried like any upload,
+        unless the downloaded clip fails the MP4 check: then ModelSlab denies the entry.
+        """
+        lease_until = datetime.now(timezone.utc) + Pipeline.STREAM_LEASE
+        try:
+            with Database.transaction():
+                log_id = Database.log_file_upload_infos([(prompt, file_name)])[0]
+                if log_id is None:
+                    return False
+                Database.mark_reviewed_batch([(log_id, ReviewStatus.ACCEPTED)])
+                scheduled_upload_time = Pipeline._claim_upload_slot(log_id, lease_until)
+        except sqlite3.Error as e:
+            print(f"Error preparing the stream upload of '{prompt}', downloading it instead: {e}")
+            return False
+
+        print(f"Attempting to stream '{prompt}' to YouTube scheduled for {scheduled_upload_time.isoformat()}")
+        uploaded = False
+        try:
+            uploaded = YoutubeUploader.upload_stream(prompt, prompt, chunks, scheduled_upload_time, log_id=log_id)
+        except QuotaExhaustedError as e:
+            print(f"Deferred upload of '{prompt}': {e}")
+        if not uploaded:
+            return False
+
+        try:
+            with Database.transaction():
+                Database.complete_generation_jobs([file_name])
+                Database.mark_youtube_uploaded_batch([(log_id, scheduled_upload_time)])
+        except sqlite3.Error as e:
+            # The video ID is stored, the journal and upload_youtube() finish this without uploading again
+            print(f"Error marking the stream upload of '{prompt}' as done: {e}")
+        return True
+
+    def resume_generation_jobs(stop : threading.Event | None = None) -> None:
+        """
+        Finishes every render journaled by a previous run that never got stored,
+        so a crash costs a short delay instead of a paid render.
+
+        Once `stop` is set it returns without waiting for the rest, they stay journaled for the next start.
+        """
+        in_flight = {}
+        for job in Database.get_unfinished_generation_jobs():
+            print(f"Resuming generation job {job.get_id()} ({job.get_status()}) for '{job.get_prompt()}'")
+            try:
+                in_flight[ModelSlab.resume(job)] = job.get_prompt()
+            except Exception as e:
+                print(f"Failed to resume generation job {job.get_id()}: {e}")
+        while in_flight:
+            if stop is not None and stop.is_set():
+                print(f"Leaving {len(in_flight)} resumed generation jobs for the next start")
+                return
+            Pipeline._log_finished_clips(in_flight, timeout=None if stop is None else Pipeline.STOP_CHECK_INTERVAL)
+
+    def _log_finished_clips(in_flight : dict, approve : bool = False, timeout : float | None = None) -> None:
+        """
+        Waits for at least one clip future to finish and logs every finished clip in one batch,
+        as approved if `approve`. Clips that are already logged, such as those downloaded after a
+        failed stream upload, aren't logged again. Their generation jobs are completed in the same
+        transaction, if it fails they stay unfinished and the clips are logged when the jobs are resumed. Returns early when none finishes within `timeout` seconds.
+        """
+        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        finished_clips = []
+        for future in done:
+            prompt = in_flight.pop(future)
+            try:
+                file_name = future.result()
+            except Exception as e:
+                print(f"Failed to generate clip for '{prompt}': {e}")
+                continue
+            if file_name is not None:
+                finished_clips.append((prompt, file_name))
+        if not finished_clips:
+            return
+        # Clips finishing together are recorded in a single commit
+        try:
+            with Database.transaction():
+                already_logged = Database.get_logged_file_names(file_name for _, file_name in finished_clips)
+                new_clips = [clip for clip in finished_clips if clip[1] not in already_logged]
+                log_ids = Database.log_file_upload_infos(new_clips)
+                logged = [(clip, log_id) for clip, log_id in zip(new_clips, log_ids) if log_id is not None]
+                Database.complete_generation_jobs([*already_logged, *(file_name for (_, file_name), _ in logged)])
+                if approve:
+                    Database.mark_reviewed_batch([(log_id, ReviewStatus.ACCEPTED) for _, log_id in logged])
+        except sqlite3.Error as e:
+            print(f"Error logging {len(finished_clips)} finished clips, they are logged when their jobs are resumed: {e}")
 
     def run() -> None:
+        load_dotenv(override=True)
+        Pipeline.resume_generation_jobs()
         Pipeline.review()
         Pipeline.upload_youtube()
         
-        if Database.count_future_youtube_uploads() < Pipeline.QUEUE_SIZE:
-            input(f"Need to generate {Pipeline.GENERATION_BATCH_SIZE} videos. Proceed?")
+        deficit = Pipeline.QUEUE_SIZE - Database.count_future_youtube_uploads()
+        if deficit > 0:
+            count = BatchPlanner.plan(deficit, reviewed=not Pipeline.DIRECT_UPLOAD)
+            input(f"Need to generate {count} videos. Proceed?")
             load_dotenv(override=True)
-            for _ in range(Pipeline.GENERATION_BATCH_SIZE):
-                prompt = PromptGenerator.generate()
-                file_name = ModelSlab.generate(prompt)
-                Database.log_file_upload_info(prompt, file_name)
+            Pipeline.generate(count, direct_upload=Pipeline.DIRECT_UPLOAD)
         
             Pipeline.review()
 
         Pipeline.upload_youtube()
+
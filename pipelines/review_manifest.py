@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from database.database import Database
+from database.file_log_entry import FileLogEntry, ReviewStatus
+from generate.video_generator import VideoGenerator
+from metrics.metrics import Metrics
+
+# --- Review Manifest ---
+# Pending clips are listed in a JSON file. Watch the clips in any player, set "decision"
+# to "Y" or "N" and save; every decision in the file is then applied in one transaction.
+# The daemon keeps the file in sync, so generation and upload never wait on a reviewer.
+REVIEW_MANIFEST_PATH = os.getenv("REVIEW_MANIFEST", "review_manifest.json")
+DECISIONS = {
+    "Y": ReviewStatus.ACCEPTED,
+    "N": ReviewStatus.DENIED,
+    ReviewStatus.ACCEPTED.value: ReviewStatus.ACCEPTED,
+    ReviewStatus.DENIED.value: ReviewStatus.DENIED,
+}
+
+
+class ReviewManifest:
+
+    def export(path : str = REVIEW_MANIFEST_PATH) -> int:
+        """
+        Lists every pending clip in the manifest. Entries already in the file keep whatever
+        the reviewer wrote, and the file is only rewritten when the pending clips changed.
+
+        Args:
+            path (str): The manifest file.
+        Returns:
+            int: The number of clips in the manifest.
+        """
+        existing = ReviewManifest._read(path)
+        if existing is None:
+            return 0
+        # Entries that aren't objects can't belong to a clip, apply() already warned about them
+        by_id = {entry.get("id"): entry for entry in existing if isinstance(entry, dict)}
+        entries = [by_id.get(rev.get_id()) or ReviewManifest._to_entry(rev) for rev in Database.get_pending_review_entries()]
+        if entries != existing:
+            ReviewManifest._write(path, entries)
+        return len(entries)
+
+    def apply(path : str = REVIEW_MANIFEST_PATH) -> int:
+        """
+        Applies every decision in the manifest in one transaction and removes the decided
+        entries from the file. Decisions for clips that are no longer pending are dropped,
+        so a stale manifest can't change a clip that was already reviewed or uploaded.
+
+        Args:
+            path (str): The manifest file.
+        Returns:
+            int: The number of decisions applied.
+        """
+        entries = ReviewManifest._read(path)
+        if not entries:
+            return 0
+        decisions = []
+        created = {}
+        remaining = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                print(f"Warning: Skipping review manifest entry {entry!r}, expected an object")
+                remaining.append(entry)
+                continue
+            decision = entry.get("decision")
+            if decision is None or decision == "":
+                remaining.append(entry)
+            elif str(decision).strip().capitalize() in DECISIONS:
+                decisions.append((entry.get("id"), DECISIONS[str(decision).strip().capitalize()]))
+                created[entry.get("id")] = entry.get("created")
+            else:
+                print(f"Warning: Unknown decision {decision!r} for log ID {entry.get('id')}, use Y or N")
+                remaining.append(entry)
+        if not decisions:
+            return 0
+
+        try:
+            with Database.transaction():
+                pending_ids = {rev.get_id() for rev in Database.get_pending_review_entries()}
+                stale = [log_id for log_id, _ in decisions if log_id not in pending_ids]
+                if stale:
+                    print(f"Skipping decisions for log IDs {stale}, they are no longer pending")
+                updated = Database.mark_reviewed_batch([(log_id, status) for log_id, status in decisions if log_id in pending_ids])
+        except sqlite3.Error as e:
+            print(f"Error applying the review manifest: {e}")
+            return 0
+        applied = [log_id for log_id, updated_ok in updated.items() if updated_ok]
+        # Decisions that didn't make it into the database stay in the file for the next attempt
+        failed = set(updated) - set(applied)
+        remaining = [entry for entry in entries if entry in remaining or entry.get("id") in failed]
+        ReviewManifest._write(path, remaining)
+        ReviewManifest._record_review_waits({log_id: created[log_id] for log_id in applied})
+        return len(applied)
+
+    def sync(path : str = REVIEW_MANIFEST_PATH) -> None:
+        """Applies the decisions made so far, then lists the clips that are pending now."""
+        applied = ReviewManifest.apply(path)
+        if applied:
+            print(f"Applied {applied} review decisions from {path}")
+        ReviewManifest.export(path)
+
+    def _record_review_waits(created_by_id : dict[int, str | None]) -> None:
+        now = datetime.now(timezone.utc)
+        for log_id, created in created_by_id.items():
+            try:
+                Metrics.record("review_wait", (now - datetime.fromisoformat(created)).total_seconds(), str(log_id))
+            except (TypeError, ValueError):
+                pass # Edited by hand, the decision still counts
+
+    def _to_entry(rev : FileLogEntry) -> dict:
+        return {
+            "id": rev.get_id(),
+            "description": rev.get_description(),
+            "path": VideoGenerator.get_clip_folder() + rev.get_filename(),
+            "created": rev.get_creation_timestamp().isoformat(),
+            "decision": None,
+        }
+
+    def _read(path : str) -> list[dict] | None:
+        """Returns the manifest entries, [] if there is no manifest, None if it can't be parsed."""
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            if not isinstance(entries, list):
+                raise ValueError("expected a list of entries")
+            return entries
+        except (OSError, ValueError) as e:
+            # Likely saved mid-edit, leave it alone until it parses again
+            print(f"Warning: Could not read review manifest {path}: {e}")
+            return None
+
+    def _write(path : str, entries : list[dict]) -> None:
+        if not entries:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        # Replaced in one step, an editor or the daemon never sees a half-written file
+        os.replace(temp_path, path)
@@ -1,6 +1,11 @@
 from functools import cache
 import json
-import random
+import threading
+
+from database.database import Database
+from prompt.prompt_sampler import PromptSampler
+
+_sampler_lock = threading.Lock()
 
 
 class PromptGenerator:
@@ -18,9 +23,24 @@ class PromptGenerator:
     
     def _get_scen_options() -> list[str]:
         return PromptGenerator._get_options("scen_options")
-    
+
+    @cache
+    def _get_sampler() -> PromptSampler:
+        """Builds the sampler once per process, with every prompt already logged or being rendered marked as used."""
+        sampler = PromptSampler(PromptGenerator._get_objects_options(),
+                                PromptGenerator._get_subject_options(),
+                                PromptGenerator._get_scen_options())
+        sampler.mark_used(entry.get_description() for entry in Database.iter_file_logs())
+        sampler.mark_used(job.get_prompt() for job in Database.get_unfinished_generation_jobs())
+        print(f"Debug: {sampler.remaining()} of {sampler.size()} prompt combinations left")
+        return sampler
+
     def generate() -> str:
-        object_pick = random.choice(PromptGenerator._get_objects_options())
-        subject_pick = random.choice(PromptGenerator._get_subject_options())
-        scen_pick = random.choice(PromptGenerator._get_scen_options())
-        return f"{object_pick} saves {subject_pick} from {scen_pick}"
\ No newline at end of file
+        """
+        Returns a prompt that hasn't been used before.
+
+        Raises:
+            PromptSpaceExhaustedError: If every combination of the option lists has been used.
+        """
+        with _sampler_lock:
+            return PromptGenerator._get_sampler().draw()
@@ -0,0 +1,110 @@
+import random
+from typing import Iterable
+
+# --- Sampling Configuration ---
+# Weighted draws pick each part by weight and retry when the combination is used. Once the
+# space is mostly used up that gets slow, so after this many misses a uniform draw is taken.
+MAX_WEIGHTED_TRIES = 32
+PROMPT_TEMPLATE = "{} saves {} from {}"
+
+
+class PromptSpaceExhaustedError(RuntimeError):
+    """Raised when every combination of the option lists has been used."""
+
+
+class PromptSampler:
+    """
+    Draws object/subject/scene combinations without replacement.
+
+    The deduplicated option lists span an indexed space of len(objects) * len(subjects) * len(scenes)
+    combinations. Used combinations are kept in a bitmap, unused ones in a list with a position
+    index, so a draw removes its pick by swapping it with the last entry, in O(1).
+
+    An option listed several times in its file counts as that many times more likely, this is its
+    weight. With `weighted=False` every unused combination is equally likely.
+    """
+
+    def __init__(self, objects : list[str], subjects : list[str], scenes : list[str], weighted : bool = True):
+        self._parts = []
+        self._weights = []
+        for options in (objects, subjects, scenes):
+            unique = list(dict.fromkeys(options)) # Keeps the file order
+            self._parts.append(unique)
+            self._weights.append([options.count(option) for option in unique])
+        self._weighted = weighted
+        self._size = len(self._parts[0]) * len(self._parts[1]) * len(self._parts[2])
+        self._used = bytearray((self._size + 7) // 8)
+        self._free = list(range(self._size))
+        self._free_position = list(range(self._size)) # Index into self._free of every unused combination
+        self._index_by_prompt = None
+
+    def size(self) -> int:
+        """Returns the number of distinct combinations."""
+        return self._size
+
+    def remaining(self) -> int:
+        """Returns the number of combinations not used yet."""
+        return len(self._free)
+
+    def draw(self) -> str:
+        """
+        Picks an unused combination and marks it as used.
+
+        Returns:
+            str: The prompt.
+        Raises:
+            PromptSpaceExhaustedError: If every combination has been used.
+        """
+        if not self._free:
+            raise PromptSpaceExhaustedError(f"All {self._size} prompt combinations have been used")
+        index = None
+        if self._weighted:
+            for _ in range(MAX_WEIGHTED_TRIES):
+                candidate = self._weighted_index()
+                if not self.is_used(candidate):
+                    index = candidate
+                    break
+        if index is None:
+            index = self._free[random.randrange(len(self._free))]
+        self._mark(index)
+        return self.get_prompt(index)
+
+    def is_used(self, index : int) -> bool:
+        return bool(self._used[index >> 3] & (1 << (index & 7)))
+
+    def mark_used(self, prompts : Iterable[str]) -> int:
+        """
+        Marks combinations as used, e.g. the descriptions of clips made earlier.
+        Prompts that aren't combinations of the current option lists are ignored.
+
+        Returns:
+            int: How many combinations were newly marked.
+        """
+        if self._index_by_prompt is None:
+            self._index_by_prompt = {self.get_prompt(index): index for index in range(self._size)}
+        marked = 0
+        for prompt in prompts:
+            index = self._index_by_prompt.get(prompt)
+            if index is not None and not self.is_used(index):
+                self._mark(index)
+                marked += 1
+        return marked
+
+    def get_prompt(self, index : int) -> str:
+        index, scene = divmod(index, len(self._parts[2]))
+        obj, subject = divmod(index, len(self._parts[1]))
+        return PROMPT_TEMPLATE.format(self._parts[0][obj], self._parts[1][subject], self._parts[2][scene])
+
+    def _weighted_index(self) -> int:
+        obj, subject, scene = (random.choices(range(len(part)), weights=weights)[0]
+                               for part, weights in zip(self._parts, self._weights))
+        return (obj * len(self._parts[1]) + subject) * len(self._parts[2]) + scene
+
+    def _mark(self, index : int) -> None:
+        self._used[index >> 3] |= 1 << (index & 7)
+        # Swap-remove from the free list
+        position = self._free_position[index]
+        last = self._free.pop()
+        if last != index:
+            self._free[position] = last
+            self._free_position[last] = position
@@ -0,0 +1,105 @@
+import queue
+import threading
+from typing import Iterable
+
+from googleapiclient.http import MediaUpload
+
+# --- Streaming Configuration ---
+MAX_BUFFERED_CHUNKS = 8 # Chunks read ahead from the source while a request is in flight
+PUT_POLL_INTERVAL = 1 # seconds between checks whether the upload was abandoned
+
+_END_OF_STREAM = object()
+
+
+class StreamingMediaUpload(MediaUpload):
+    """
+    A resumable MediaUpload of unknown size fed from an iterable of chunks, such as
+    requests' iter_content(). A background thread reads the source into a bounded queue,
+    so the download keeps going while a chunk is being uploaded, and only the chunk in
+    flight plus the queue are held in memory.
+
+    googleapiclient asks for each chunk with getbytes() and may ask for it again after
+    an error, so the bytes from the start of the last requested chunk are kept until the
+    next chunk is requested. size() reads one byte past the next chunk, so the final
+    chunk is always sent with the real total size.
+    """
+
+    def __init__(self, chunks : Iterable[bytes], mimetype : str = "video/mp4", chunksize : int = 8 * 1024 * 1024,
+                 max_buffered_chunks : int = MAX_BUFFERED_CHUNKS):
+        super().__init__()
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._queue = queue.Queue(maxsize=max_buffered_chunks)
+        self._closed = threading.Event()
+        self._buffer = bytearray()
+        self._buffer_start = 0 # Stream offset of self._buffer[0]
+        self._requested_end = 0 # Stream offset after the last chunk handed out
+        self._total_size = None # Known once the source is exhausted
+        self._reader = threading.Thread(target=self._read, args=(chunks,), daemon=True, name="streaming-upload-reader")
+        self._reader.start()
+
+    def chunksize(self) -> int:
+        return self._chunksize
+
+    def mimetype(self) -> str:
+        return self._mimetype
+
+    def size(self) -> int | None:
+        """Returns the total size once the source is exhausted. Reads ahead far enough to tell for the next chunk."""
+        self._fill(self._requested_end + self._chunksize + 1)
+        return self._total_size
+
+    def resumable(self) -> bool:
+        return True
+
+    def has_stream(self) -> bool:
+        return False
+
+    def getbytes(self, begin : int, length : int) -> bytes:
+        """
+        Returns up to `length` bytes from offset `begin`, fewer only at the end of the stream.
+
+        Raises:
+            RuntimeError: If `begin` lies before the last chunk handed out, or the source failed.
+        """
+        if begin < self._buffer_start:
+            raise RuntimeError(f"Stream offset {begin} was already discarded (buffer starts at {self._buffer_start})")
+        del self._buffer[:begin - self._buffer_start]
+        self._buffer_start = begin
+        self._fill(begin + length)
+        self._requested_end = begin + min(length, len(self._buffer))
+        return bytes(self._buffer[:length])
+
+    def close(self) -> None:
+        """Stops the reader thread, e.g. when the upload was abandoned half-way."""
+        self._closed.set()
+
+    def _fill(self, end : int) -> None:
+        while self._total_size is None and self._buffer_start + len(self._buffer) < end:
+            item = self._queue.get()
+            if item is _END_OF_STREAM:
+                self._total_size = self._buffer_start + len(self._buffer)
+            elif isinstance(item, BaseException):
+                raise RuntimeError(f"Reading the upload source failed: {item}") from item
+            else:
+                self._buffer += item
+
+    def _read(self, chunks : Iterable[bytes]) -> None:
+        try:
+            for chunk in chunks:
+                if chunk and not self._put(chunk):
+                    return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(_END_OF_STREAM)
+
+    def _put(self, item) -> bool:
+        """Queues an item, giving up once the upload is closed. Returns whether it was queued."""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from database.database import Database
+
+# --- YouTube Data API Quota ---
+# The daily quota resets at midnight Pacific Time. Every request is charged, failed ones included.
+QUOTA_NAME = "youtube"
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", 10000))
+VIDEOS_INSERT_COST = 1600
+
+
+class QuotaExhaustedError(RuntimeError):
+    """Raised when a call would exceed the daily quota. Retry once next_window_start() has passed."""
+
+
+class YoutubeQuota:
+    """
+    Accounts for the YouTube Data API daily quota in the database, so every run and every
+    worker shares one budget. Calls that don't fit are refused locally instead of being sent
+    and failing with quotaExceeded.
+    """
+
+    def try_consume(cost : int) -> bool:
+        """
+        Spends `cost` units of today's quota.
+
+        Returns:
+            bool: True if the units were available and are now spent, False otherwise.
+        """
+        return Database.consume_api_quota(QUOTA_NAME, cost, DAILY_QUOTA, YoutubeQuota.window_start())
+
+    def exhaust() -> None:
+        """Marks today's quota as used up, for when the API reports quotaExceeded before we expected it."""
+        Database.exhaust_api_quota(QUOTA_NAME, DAILY_QUOTA, YoutubeQuota.window_start())
+
+    def remaining() -> int:
+        """Returns the units left in today's quota."""
+        return max(0, DAILY_QUOTA - Database.get_api_quota_used(QUOTA_NAME, YoutubeQuota.window_start()))
+
+    def window_start() -> datetime:
+        """Returns the start of the current quota day, midnight Pacific Time."""
+        return datetime.combine(datetime.now(QUOTA_TIMEZONE).date(), time(), QUOTA_TIMEZONE)
+
+    def next_window_start() -> datetime:
+        """Returns when the quota next resets."""
+        return datetime.combine(YoutubeQuota.window_start().date() + timedelta(days=1), time(), QUOTA_TIMEZONE)
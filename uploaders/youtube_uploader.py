@@ -1,12 +1,25 @@
 import os
 import datetime # Import datetime module
-from typing import Optional # Import Optional for type hints
+import json
+import threading
+import time
+from typing import Callable, Iterable, Optional # Import Optional for type hints
 
+import google.auth.transport.requests
 import google.oauth2.credentials
+import google_auth_httplib2
 import google_auth_oauthlib.flow
+import httplib2
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaUpload
+
+from database.database import Database
+from database.youtube_upload import YoutubeUpload
+from generate.mp4 import Mp4, Mp4Error
+from metrics.metrics import Metrics
+from uploaders.streaming_media_upload import StreamingMediaUpload
+from uploaders.youtube_quota import VIDEOS_INSERT_COST, QuotaExhaustedError, YoutubeQuota
 
 # The CLIENT_SECRETS_FILE is the JSON file you downloaded from the Google Cloud Console.
 CLIENT_SECRETS_FILE = "client_secrets.json"
@@ -19,6 +32,21 @@ SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
 YOUTUBE_API_SERVICE_NAME = 'youtube'
 YOUTUBE_API_VERSION = 'v3'
 
+# Credentials are refreshed ahead of time when they expire within this margin,
+# so a long upload never starts with a token about to run out.
+CREDENTIALS_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Bytes sent per request of a resumable upload, must be a multiple of 256 KiB.
+# Progress is stored after every chunk, so this is also the most a crash can cost.
+UPLOAD_CHUNK_SIZE = int(os.getenv("YOUTUBE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# --- Retries ---
+# A failed upload waits RETRY_BASE_DELAY, doubled after every further failure up to RETRY_MAX_DELAY,
+# and is dead-lettered after MAX_UPLOAD_ATTEMPTS failures so a broken file stops costing quota.
+MAX_UPLOAD_ATTEMPTS = 5
+RETRY_BASE_DELAY = datetime.timedelta(hours=1)
+RETRY_MAX_DELAY = datetime.timedelta(hours=24)
+
 # --- VIDEO METADATA (Customize these!) ---
 TAGS = ['GoodVibes', 'Pets', 'Dog', 'FeelGood', 'Shorts']
 CATEGORY_ID = '24'  # '22' is "People & Blogs". Common IDs: 1 (Film), 2 (Autos), 10 (Music), 15 (Pets), 17 (Sports), 19 (Travel), 20 (Gaming), 22 (People & Blogs), 23 (Comedy), 24 (Entertainment), 25 (News & Politics), 26 (Howto & Style), 27 (Education), 28 (Science & Technology), 29 (Nonprofits & Activism)
@@ -28,35 +56,80 @@ DEFAULT_PRIVACY_STATUS = 'private' # Renamed for clarity: Use a default, but it
 INTENDED_FOR_CHILDREN = False # Sets "Intended for children" (Made for Kids) to False
 MODIFIED_CONTENT_AI = True   # Sets "Altered or synthetic content" to True
 
+# --- Process-wide client cache ---
+# The service object is built once and shared. Its HTTP transport (httplib2) is not
+# thread-safe, so requests are executed with a per-thread authorized Http from _get_http().
+_service = None
+_credentials = None
+_client_lock = threading.Lock()
+_http_local = threading.local()
+
 class YoutubeUploader:
 
     def _get_authenticated_service():
-        """Authenticates the user and returns the YouTube API service object."""
-        credentials = None
+        """
+        Returns the cached YouTube API service object, authenticating and building it on first use.
+        The service is built from the discovery document bundled with googleapiclient, so no
+        network round-trip is needed, and credentials are only refreshed when close to expiry.
+        """
+        global _service
+        with _client_lock:
+            credentials = YoutubeUploader._get_credentials()
+            if _service is None:
+                _service = build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, credentials=credentials,
+                                 static_discovery=True, cache_discovery=False)
+            return _service
+
+    def _get_http() -> google_auth_httplib2.AuthorizedHttp:
+        """Returns the calling thread's authorized Http, for executing requests built by the shared service."""
+        YoutubeUploader._get_authenticated_service() # Makes sure the credentials are fresh
+        http = getattr(_http_local, "http", None)
+        if http is None or http.credentials is not _credentials:
+            http = google_auth_httplib2.AuthorizedHttp(_credentials, http=httplib2.Http())
+            _http_local.http = http
+        return http
+
+    def _get_credentials() -> google.oauth2.credentials.Credentials:
+        """Loads, refreshes or obtains the user's credentials. Must be called holding _client_lock."""
+        global _credentials
 
         # Check if a cached token exists
-        if os.path.exists('token.json'):
-            credentials = google.oauth2.credentials.Credentials.from_authorized_user_file('token.json', SCOPES)
+        if _credentials is None and os.path.exists('token.json'):
+            _credentials = google.oauth2.credentials.Credentials.from_authorized_user_file('token.json', SCOPES)
+
+        if _credentials is not None and _credentials.valid and not YoutubeUploader._expires_soon(_credentials):
+            return _credentials
 
         # If no valid token, or token expired/needs refresh, initiate flow
-        if not credentials or not credentials.valid:
-            if credentials and credentials.expired and credentials.refresh_token:
-                credentials.refresh(google.auth.transport.requests.Request())
-            else:
-                flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
-                    CLIENT_SECRETS_FILE, SCOPES)
-                credentials = flow.run_local_server(port=0)
+        if _credentials and _credentials.refresh_token:
+            _credentials.refresh(google.auth.transport.requests.Request())
+        else:
+            flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
+                CLIENT_SECRETS_FILE, SCOPES)
+            _credentials = flow.run_local_server(port=0)
 
-            # Save the credentials for the next run
-            with open('token.json', 'w') as token:
-                token.write(credentials.to_json())
+        # Save the credentials for the next run
+        with open('token.json', 'w') as token:
+            token.write(_credentials.to_json())
+        return _credentials
 
-        return build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, credentials=credentials)
+    def _expires_soon(credentials : google.oauth2.credentials.Credentials) -> bool:
+        if credentials.expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return credentials.expiry - now < CREDENTIALS_REFRESH_MARGIN
 
     def upload_video(title : str, description : str, file_path : str,
-                     schedule_datetime: Optional[datetime.datetime] = None) -> bool:
+                     schedule_datetime: Optional[datetime.datetime] = None,
+                     log_id: Optional[int] = None, chunk_size : int = UPLOAD_CHUNK_SIZE,
+                     reschedule: Optional[Callable[[], datetime.datetime]] = None) -> bool:
         """
         Uploads a video to YouTube.
+        When a log ID is given, the resumable session and its progress are stored in the database,
+        so an interrupted upload continues where it stopped, and a video that was already created
+        is never inserted again. Failures are recorded too, so the upload backs off before it is
+        retried and is given up on after MAX_UPLOAD_ATTEMPTS.
 
         Args:
             title (str): The title of the video.
@@ -67,13 +140,79 @@ class YoutubeUploader:
                 privacy status will be set to 'private' until the scheduled time,
                 regardless of DEFAULT_PRIVACY_STATUS. The datetime should be
                 timezone-aware (UTC recommended) or will be treated as local.
+                Ignored when resuming, the session keeps the metadata it was created with.
+            log_id (Optional[int]): The ID of the file log entry being uploaded.
+            chunk_size (int): Bytes sent per request, a multiple of 256 KiB.
+            reschedule (Optional[Callable[[], datetime.datetime]]): Called for a new publish time when
+                the stored session can't be resumed and its publish time has passed, since YouTube
+                rejects a new upload scheduled in the past.
         Returns:
             bool: True if upload was successful, False otherwise.
+        Raises:
+            QuotaExhaustedError: If the daily API quota can't cover the upload. Nothing was
+                sent, so the upload should be deferred rather than counted as a failure.
         """
+        upload = Database.get_youtube_upload(log_id) if log_id is not None else None
+        if upload is not None and upload.get_video_id():
+            print(f"Info: Log ID {log_id} was already uploaded as video {upload.get_video_id()}, skipping.")
+            return True
+
         if not os.path.exists(file_path):
             print(f"Error: Video file not found at {file_path}")
+            YoutubeUploader._record_failure(log_id, upload, f"Video file not found at {file_path}")
+            return False
+
+        # A broken file would spend quota on an upload YouTube can't process
+        try:
+            Mp4.inspect(file_path)
+        except Mp4Error as e:
+            print(f"Error: {e}")
+            YoutubeUploader._record_failure(log_id, upload, str(e), permanent=True)
             return False
 
+        # Create a MediaFileUpload object for the video file
+        media_body = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
+        return YoutubeUploader._upload_media(title, description, media_body, file_path, schedule_datetime, log_id, upload, reschedule)
+
+    def upload_stream(title : str, description : str, chunks : Iterable[bytes],
+                      schedule_datetime: Optional[datetime.datetime] = None,
+                      log_id: Optional[int] = None, chunk_size : int = UPLOAD_CHUNK_SIZE) -> bool:
+        """
+        Uploads a video read from a stream of chunks, e.g. an HTTP download, without writing it to disk.
+        The stream is consumed while uploading through a bounded buffer, so downloading and uploading
+        overlap. An interrupted stream can't be resumed, so no session is stored: fall back to
+        downloading the file and upload_video() when this fails. With a log ID the created video
+        and any failure are still recorded, so the retry never uploads the clip a second time.
+
+        Args:
+            title (str): The title of the video.
+            description (str): The description of the video.
+            chunks (Iterable[bytes]): The video data.
+            schedule_datetime (Optional[datetime.datetime]): See upload_video().
+            log_id (Optional[int]): The ID of the file log entry being uploaded.
+            chunk_size (int): Bytes sent per request, a multiple of 256 KiB.
+        Returns:
+            bool: True if upload was successful, False otherwise.
+        Raises:
+            QuotaExhaustedError: If the daily API quota can't cover the upload.
+        """
+        media_body = StreamingMediaUpload(chunks, chunksize=chunk_size)
+        try:
+            # The file downloaded after a failed stream is rewritten by faststart, so the stream's
+            # session must not be resumed with it
+            return YoutubeUploader._upload_media(title, description, media_body, "stream", schedule_datetime,
+                                                 log_id, resumable=False)
+        finally:
+            media_body.close()
+
+    def _upload_media(title : str, description : str, media_body : MediaUpload, source : str,
+                      schedule_datetime: Optional[datetime.datetime] = None,
+                      log_id: Optional[int] = None, upload : Optional[YoutubeUpload] = None,
+                      reschedule: Optional[Callable[[], datetime.datetime]] = None, resumable : bool = True) -> bool:
+        """
+        Inserts a video from any MediaUpload. Shared by upload_video() and upload_stream(), returns and raises like them.
+        With `resumable` the session is stored after every chunk, so an interrupted upload can continue.
+        """
         effective_privacy_status = DEFAULT_PRIVACY_STATUS
         publish_at_str = None
 
@@ -120,12 +259,10 @@ class YoutubeUploader:
         if publish_at_str:
             body['status']['publishAt'] = publish_at_str
 
-        # Create a MediaFileUpload object for the video file
-        media_body = MediaFileUpload(file_path, resumable=True)
-
         # Call the API's videos.insert method to upload the video.
+        upload_started = time.monotonic()
         try:
-            print(f"Uploading video: '{title}' from '{file_path}'...")
+            print(f"Uploading video: '{title}' from '{source}'...")
             youtube_service = YoutubeUploader._get_authenticated_service()
             insert_request = youtube_service.videos().insert(
                 part=','.join(body.keys()),
@@ -134,10 +271,39 @@ class YoutubeUploader:
             )
 
             response = None
+            if upload is not None and upload.get_session_uri():
+                response = YoutubeUploader._resume_session(insert_request, upload, media_body.size())
+            if (response is None and insert_request.resumable_uri is None and reschedule is not None
+                    and schedule_datetime is not None and schedule_datetime <= datetime.datetime.now(datetime.timezone.utc)):
+                # The stored publish time only holds for the session it was sent with, a new one needs a future slot
+                schedule_datetime = reschedule().astimezone(datetime.timezone.utc)
+                body['status']['publishAt'] = schedule_datetime.strftime('%Y-%m-%dT%H:%M:%SZ')
+                print(f"Info: Publish time has passed, scheduling the new upload for {schedule_datetime.isoformat()}.")
+                insert_request = youtube_service.videos().insert(
+                    part=','.join(body.keys()),
+                    body=body,
+                    media_body=media_body
+                )
+            if response is None and insert_request.resumable_uri is None:
+                # Only starting a session calls videos.insert, continuing one isn't charged again
+                if not YoutubeQuota.try_consume(VIDEOS_INSERT_COST):
+                    raise QuotaExhaustedError(f"YouTube quota exhausted until {YoutubeQuota.next_window_start().isoformat()}")
+            # Only what is sent now counts towards the throughput, not what an earlier attempt sent
+            start_progress = insert_request.resumable_progress or 0
+            upload_started = time.monotonic()
             while response is None:
-                status, response = insert_request.next_chunk()
+                status, response = insert_request.next_chunk(http=YoutubeUploader._get_http())
                 if status:
                     print(f"Uploaded {int(status.progress() * 100)}%")
+                if response is None and log_id is not None and resumable:
+                    Database.save_youtube_upload_session(log_id, insert_request.resumable_uri,
+                                                         insert_request.resumable_progress, schedule_datetime)
+
+            if log_id is not None:
+                Database.set_youtube_upload_video_id(log_id, response['id'])
+            total_size = media_body.size()
+            Metrics.record("upload", time.monotonic() - upload_started, source,
+                           total_size - start_progress if total_size is not None else None)
 
             print("\nUpload Complete!")
             print(f"Video ID: {response['id']}")
@@ -152,9 +318,64 @@ class YoutubeUploader:
                 print("Video published immediately (not scheduled).")
             return True
 
+        except QuotaExhaustedError:
+            raise
         except HttpError as e:
+            if b"quotaExceeded" in e.content:
+                # Our count was off (e.g. quota spent elsewhere), nothing more fits today
+                YoutubeQuota.exhaust()
+                raise QuotaExhaustedError(f"YouTube quota exceeded until {YoutubeQuota.next_window_start().isoformat()}") from e
             print(f"An HTTP error {e.resp.status} occurred:\n{e.content.decode()}")
+            Metrics.record("upload", time.monotonic() - upload_started, source, ok=False)
+            YoutubeUploader._record_failure(log_id, upload, f"HTTP {e.resp.status}: {e.content.decode()}")
             return False
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-            return False
\ No newline at end of file
+            Metrics.record("upload", time.monotonic() - upload_started, source, ok=False)
+            YoutubeUploader._record_failure(log_id, upload, f"{type(e).__name__}: {e}")
+            return False
+
+    def _record_failure(log_id : Optional[int], upload : Optional[YoutubeUpload], error : str,
+                        permanent : bool = False) -> None:
+        """Schedules the next attempt with exponential backoff, or dead-letters the upload if it can't succeed."""
+        if log_id is None:
+            return
+        attempts = (upload.get_attempts() if upload is not None else 0) + 1
+        dead_letter = permanent or attempts >= MAX_UPLOAD_ATTEMPTS
+        next_attempt_at = None
+        if dead_letter:
+            print(f"Error: Upload of log ID {log_id} failed {attempts} times, giving up on it: {error}")
+        else:
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+            next_attempt_at = datetime.datetime.now(datetime.timezone.utc) + delay
+            print(f"Info: Retrying upload of log ID {log_id} after {next_attempt_at.isoformat()} (attempt {attempts} failed).")
+        Database.record_youtube_upload_failure(log_id, attempts, error, next_attempt_at, dead_letter)
+
+    def _resume_session(insert_request, upload : YoutubeUpload, total_size : int) -> Optional[dict]:
+        """
+        Points an insert request at a stored upload session, continuing from the offset the server
+        reports, which can be ahead of the stored progress if the process died mid-chunk.
+
+        Returns:
+            Optional[dict]: The API response if the upload had already completed, None otherwise.
+                A session that expired leaves the request untouched, so a new upload is started.
+        """
+        session_uri = upload.get_session_uri()
+        resp, content = YoutubeUploader._get_http().request(
+            session_uri, method="PUT", body=b"",
+            headers={"Content-Length": "0", "Content-Range": f"bytes */{total_size}"})
+
+        if resp.status in (200, 201):
+            print(f"Info: Stored upload session for log ID {upload.get_log_id()} had already completed.")
+            return json.loads(content)
+        if resp.status == 308:
+            # 'Range: bytes=0-N' lists what was received, no header means nothing was
+            received = resp.get("range")
+            offset = int(received.rsplit("-", 1)[1]) + 1 if received else 0
+            insert_request.resumable_uri = session_uri
+            insert_request.resumable_progress = offset
+            print(f"Resuming upload for log ID {upload.get_log_id()} at byte {offset} of {total_size}")
+            return None
+
+        print(f"Warning: Upload session for log ID {upload.get_log_id()} can't be resumed (HTTP {resp.status}), starting over.")
+        return None